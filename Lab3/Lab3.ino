@@ -12,6 +12,21 @@ Adafruit_VL53L1X vl53 = Adafruit_VL53L1X();
 #define MAX_BUFFER_SIZE   4000
 #define BLOCK_SIZE        10
 #define ACK_TIMEOUT_MS    5000
+#define RETX_TIMEOUT_MS   1000
+#define MAX_RETRIES       5
+#define MAX_WINDOW        32
+
+// FETCH_BIN: varios SensorData por notificación
+// [magic u8][índice u16][n u8][n × (u64 ts, i16 d1, i16 d2, i16 d3)][crc16 u16]
+#define BIN_MAGIC            0xB1
+#define LIVE_MAGIC           0xB2   // misma trama, una muestra recién tomada
+#define BIN_HEADER_SIZE      4
+#define BIN_RECORD_SIZE      14
+#define BIN_CRC_SIZE         2
+#define BIN_MIN_PAYLOAD      20
+#define BIN_MAX_PAYLOAD      512
+#define BIN_FRAMES_PER_BLOCK 8
+#define BIN_NOTIFY_DELAY_MS  10
 
 BLECharacteristic *pCharacteristic;
 bool deviceConnected = false;
@@ -39,10 +54,17 @@ unsigned long lastSampleTime = 0;
 
 volatile int lastAckBlock = -1;
 
-enum State { IDLE, PREPARE_SEND, SENDING_BLOCK, WAITING_ACK, FINISHED };
+enum State { IDLE, PREPARE_SEND, SENDING_BLOCK, FINISHED };
 State currentState = IDLE;
 unsigned long stateStartTime = 0;
-int blockIndex = 0;
+int blockIndex = 0;       // siguiente bloque a enviar
+int ackWindow = 1;        // bloques en vuelo sin ACK (1 = stop-and-wait)
+int progressAck = -1;
+int retries = 0;
+
+bool binaryMode = false;
+bool liveStreaming = false;
+int binPayload  = BIN_MIN_PAYLOAD;
 
 void tca_select(uint8_t channel) {
   if (channel > 7) return;
@@ -51,6 +73,82 @@ void tca_select(uint8_t channel) {
   Wire.endTransmission();
 }
 
+uint16_t crc16_ccitt(const uint8_t *data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+int recordsPerFrame() {
+  return max(1, (binPayload - BIN_HEADER_SIZE - BIN_CRC_SIZE) / BIN_RECORD_SIZE);
+}
+
+int currentBlockSize() {
+  return binaryMode ? recordsPerFrame() * BIN_FRAMES_PER_BLOCK : BLOCK_SIZE;
+}
+
+void sendBinaryRange(int start, int end, uint8_t magic) {
+  uint8_t frame[BIN_MAX_PAYLOAD];
+  int perFrame = recordsPerFrame();
+  for (int i = start; i < end; i += perFrame) {
+    int n = min(perFrame, end - i);
+    frame[0] = magic;
+    frame[1] = i & 0xFF;
+    frame[2] = (i >> 8) & 0xFF;
+    frame[3] = n;
+    uint8_t *p = frame + BIN_HEADER_SIZE;
+    for (int j = 0; j < n; j++) {
+      const SensorData &d = dataBuffer[i + j];
+      memcpy(p,      &d.timestamp, 8);
+      memcpy(p + 8,  &d.dist1, 2);
+      memcpy(p + 10, &d.dist2, 2);
+      memcpy(p + 12, &d.dist3, 2);
+      p += BIN_RECORD_SIZE;
+    }
+    uint16_t crc = crc16_ccitt(frame, p - frame);
+    *p++ = crc & 0xFF;
+    *p++ = crc >> 8;
+    pCharacteristic->setValue(frame, p - frame);
+    pCharacteristic->notify();
+    delay(BIN_NOTIFY_DELAY_MS);
+  }
+}
+
+int totalBlocks() {
+  int bs = currentBlockSize();
+  return (dataIndex + bs - 1) / bs;
+}
+
+void sendBlock(int b) {
+  int start = b * currentBlockSize();
+  int end = min(start + currentBlockSize(), dataIndex);
+
+  if (binaryMode) sendBinaryRange(start, end, BIN_MAGIC);
+  else for (int i = start; i < end; i++) {
+    SensorData d = dataBuffer[i];
+    char out[80];
+    sprintf(out, "%d,%lu.%03u,%d,%d,%d",
+      i,
+      (unsigned long)(d.timestamp / 1000),
+      (unsigned)(d.timestamp % 1000),
+      d.dist1, d.dist2, d.dist3);
+    pCharacteristic->setValue(out);
+    pCharacteristic->notify();
+    delay(40);
+  }
+
+  // El host confirma el bloque sólo si recibió en orden todo hasta `end`
+  char wait[32];
+  sprintf(wait, "WAIT_ACK:%d:%d", b, end);
+  pCharacteristic->setValue(wait);
+  pCharacteristic->notify();
+}
+
 class MyServerCallbacks : public BLEServerCallbacks {
   void onConnect(BLEServer *pServer) override {
     deviceConnected = true;
@@ -97,11 +195,22 @@ class CharCallback : public BLECharacteristicCallbacks {
         Serial.println("🎬 SYNC OK, grabando...");
       }
     }
-    else if (msg == "FETCH") {
-      Serial.println("📦 FETCH solicitado");
+    else if (msg == "FETCH" || msg.startsWith("FETCH_BIN")) {
+      binaryMode = msg.startsWith("FETCH_BIN");
+      if (binaryMode) {
+        binPayload = BIN_MIN_PAYLOAD;
+        if (msg.length() > 10 && msg.charAt(9) == ':') {
+          binPayload = constrain(msg.substring(10).toInt(), BIN_MIN_PAYLOAD, BIN_MAX_PAYLOAD);
+        }
+        Serial.printf("📦 FETCH_BIN solicitado (%d bytes, %d muestras/trama)\n", binPayload, recordsPerFrame());
+      } else {
+        Serial.println("📦 FETCH solicitado");
+      }
       recording = false;
       blockIndex = 0;
       lastAckBlock = -1;
+      progressAck = -1;
+      retries = 0;
       currentState = PREPARE_SEND;
       stateStartTime = millis();
     }
@@ -123,8 +232,18 @@ class CharCallback : public BLECharacteristicCallbacks {
       }
     }
     else if (msg.startsWith("ACK:BLOCK_")) {
-      lastAckBlock = msg.substring(10).toInt();
-      Serial.printf("✅ ACK: bloque %d\n", lastAckBlock);
+      // ACK acumulativo: confirma todos los bloques hasta el indicado
+      int ack = msg.substring(10).toInt();
+      if (ack > lastAckBlock) lastAckBlock = ack;
+      Serial.printf("✅ ACK: bloque %d\n", ack);
+    }
+    else if (msg.startsWith("WINDOW:")) {
+      ackWindow = constrain(msg.substring(7).toInt(), 1, MAX_WINDOW);
+      Serial.printf("🪟 Ventana de ACK = %d bloques\n", ackWindow);
+    }
+    else if (msg.startsWith("LIVE:")) {
+      liveStreaming = msg.substring(5).toInt() != 0;
+      Serial.printf("📡 Streaming en vivo %s\n", liveStreaming ? "activado" : "desactivado");
     }
     else if (msg == "GET_MEM") {
       size_t freeHeap = ESP.getFreeHeap();
@@ -152,6 +271,7 @@ void setup() {
   }
 
   BLEDevice::init("ESP32-VL53L1X");
+  BLEDevice::setMTU(517);
   BLEServer *pServer = BLEDevice::createServer();
   pServer->setCallbacks(new MyServerCallbacks());
 
@@ -193,6 +313,9 @@ void loop() {
       }
 
       dataBuffer[dataIndex++] = d;
+      if (liveStreaming && deviceConnected && currentState == IDLE) {
+        sendBinaryRange(dataIndex - 1, dataIndex, LIVE_MAGIC);
+      }
       Serial.printf("📍 %lu.%03u,%d,%d,%d\n",
         (unsigned long)(ts_ms / 1000),
         (unsigned int)(ts_ms % 1000),
@@ -205,47 +328,34 @@ void loop() {
     currentState = SENDING_BLOCK;
   }
   else if (currentState == SENDING_BLOCK) {
-    int start = blockIndex * BLOCK_SIZE;
-    int end = min(start + BLOCK_SIZE, dataIndex);
-
-    for (int i = start; i < end; i++) {
-      SensorData d = dataBuffer[i];
-      char out[80];
-      sprintf(out, "%d,%lu.%03u,%d,%d,%d",
-        i,
-        (unsigned long)(d.timestamp / 1000),
-        (unsigned)(d.timestamp % 1000),
-        d.dist1, d.dist2, d.dist3);
-      pCharacteristic->setValue(out);
-      pCharacteristic->notify();
-      delay(40);
+    int acked = lastAckBlock;
+    if (acked != progressAck) {
+      progressAck = acked;
+      retries = 0;
+      stateStartTime = millis();
     }
 
-    char wait[32];
-    sprintf(wait, "WAIT_ACK:%d", blockIndex);
-    pCharacteristic->setValue(wait);
-    pCharacteristic->notify();
-
-    currentState = WAITING_ACK;
-    stateStartTime = millis();
-  }
-  else if (currentState == WAITING_ACK) {
-    if (lastAckBlock == blockIndex) {
-      blockIndex++;
-      if (blockIndex * BLOCK_SIZE >= dataIndex) {
-        pCharacteristic->setValue("END");
-        pCharacteristic->notify();
-        stateStartTime = millis();
-        currentState = FINISHED;
-        Serial.println("🏁 Envío completo, esperando ACK:BLOCK_9999");
+    if (acked >= totalBlocks() - 1) {
+      pCharacteristic->setValue("END");
+      pCharacteristic->notify();
+      stateStartTime = millis();
+      currentState = FINISHED;
+      Serial.println("🏁 Envío completo, esperando ACK:BLOCK_9999");
+    }
+    else if (blockIndex < totalBlocks() && blockIndex <= acked + ackWindow) {
+      sendBlock(blockIndex++);
+    }
+    else if (millis() - stateStartTime > RETX_TIMEOUT_MS) {
+      if (++retries > MAX_RETRIES) {
+        Serial.printf("❌ Timeout esperando ACK bloque %d\n", acked + 1);
+        currentState = IDLE;
       } else {
-        currentState = SENDING_BLOCK;
+        // Go-back-N: reenviar todo lo no confirmado
+        blockIndex = acked + 1;
+        stateStartTime = millis();
+        Serial.printf("🔁 Reenviando desde bloque %d\n", blockIndex);
       }
     }
-    else if (millis() - stateStartTime > ACK_TIMEOUT_MS) {
-      Serial.printf("❌ Timeout esperando ACK bloque %d\n", blockIndex);
-      currentState = IDLE;
-    }
   }
   else if (currentState == FINISHED) {
     if (lastAckBlock == 9999) {
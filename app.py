@@ -1,90 +1,32 @@
 import re
 import sys
-import time
 import queue
-import threading
-import asyncio
-import csv
-import datetime
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QSpinBox, QPushButton, QTextEdit
+    QLabel, QSpinBox, QPushButton, QTextEdit, QCheckBox
 )
 from PyQt5.QtCore import QTimer
-from bleak import BleakScanner, BleakClient
 
-SERVICE_UUID = "12345678-1234-1234-1234-1234567890ab"
-CHAR_UUID    = "abcd1234-5678-90ab-cdef-1234567890ab"
-ESP32_ADDR   = "1773840C-16AD-9822-65C7-87488BCE5B7C"
+from ble_manager import BLEManager, sync_command
+from capture_writer import CaptureWriter, default_capture_path
+from distance_filters import FilteringSink
+from live_stream import LiveInclinometer
+from ble_protocol import MAX_WINDOW
 
 SAMPLE_EX = "1747410717.502,122,397,260"
 SAMPLE_SIZE = len(SAMPLE_EX)
 
-class BLEManager:
-    def __init__(self, msg_q):
-        self.msg_q = msg_q
-        self.loop   = asyncio.new_event_loop()
-        self.client = None
-        threading.Thread(target=self._run_loop, daemon=True).start()
-
-    def _run_loop(self):
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_forever()
-
-    def connect(self):
-        asyncio.run_coroutine_threadsafe(self._connect(), self.loop)
-
-    async def _connect(self):
-        self.msg_q.put("Buscando ESP32...")
-        devices = await BleakScanner.discover(timeout=5.0)
-        target = next((d for d in devices if d.address.upper() == ESP32_ADDR.upper()), None)
-        if not target:
-            self.msg_q.put("No se encontró ESP32 por dirección")
-            return
-        self.msg_q.put(f"Intentando conectar a {target.address}")
-        self.client = BleakClient(target.address)
-        try:
-            await self.client.connect()
-            self.msg_q.put("Conectado al ESP32")
-            await self.client.start_notify(CHAR_UUID, self._notification_handler)
-        except Exception as e:
-            self.msg_q.put(f"Error BLE: {e}")
-
-    def _notification_handler(self, sender, data):
-        text = data.decode("utf-8").strip()
-        self.msg_q.put(text)
-
-    async def _send(self, cmd):
-        if self.client and self.client.is_connected:
-            self.msg_q.put(f"DBG: enviando '{cmd}'")
-            try:
-                await self.client.write_gatt_char(CHAR_UUID, cmd.encode("utf-8"), response=True)
-                self.msg_q.put(f"DBG: '{cmd}' enviado (request)")
-            except Exception as e:
-                self.msg_q.put(f"DBG: error al enviar: {e}")
-        else:
-            self.msg_q.put("No conectado. Presiona 'Conectar ESP32' primero.")
-
-    def send(self, cmd):
-        asyncio.run_coroutine_threadsafe(self._send(cmd), self.loop)
-
-    def is_connected(self):
-        return bool(self.client and self.client.is_connected)
-
-    def close(self):
-        if self.client:
-            asyncio.run_coroutine_threadsafe(self.client.disconnect(), self.loop)
-
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Sync BLE Clock – PyQt5")
         self.msg_q = queue.Queue()
         self.ble    = BLEManager(self.msg_q)
-        self.csv_writing = False
-        self.csv_file = None
-        self.csv_writer = None
+        self.capture = None
+        self.closing = []
+        self.live = LiveInclinometer()
+        self.ble.live_sink = self.live.push_records
         self._build_ui()
         self._start_timer()
 
@@ -98,6 +40,15 @@ class MainWindow(QWidget):
         h_params.addWidget(QLabel("Hz:"))
         self.spin_freq = QSpinBox(); self.spin_freq.setRange(1, 10); self.spin_freq.setValue(2)
         h_params.addWidget(self.spin_freq)
+        self.chk_binary = QCheckBox("Transferencia binaria"); self.chk_binary.setChecked(False)
+        h_params.addWidget(self.chk_binary)
+        h_params.addWidget(QLabel("Ventana:"))
+        self.spin_window = QSpinBox(); self.spin_window.setRange(1, MAX_WINDOW); self.spin_window.setValue(8)
+        h_params.addWidget(self.spin_window)
+        self.chk_filter = QCheckBox("Filtrar lecturas"); self.chk_filter.setChecked(False)
+        h_params.addWidget(self.chk_filter)
+        self.chk_live = QCheckBox("En vivo"); self.chk_live.toggled.connect(self.toggle_live)
+        h_params.addWidget(self.chk_live)
         vbox.addLayout(h_params)
 
         h_buttons = QHBoxLayout()
@@ -120,6 +71,8 @@ class MainWindow(QWidget):
         vbox.addWidget(self.label_status)
         self.label_mem    = QLabel("Muestras posibles: N/A")
         vbox.addWidget(self.label_mem)
+        self.label_live   = QLabel("Pared: sin datos en vivo")
+        vbox.addWidget(self.label_live)
 
         self.text_log = QTextEdit(readOnly=True)
         vbox.addWidget(self.text_log)
@@ -147,9 +100,7 @@ class MainWindow(QWidget):
 
     def sync(self):
         self.btn_sync.setEnabled(False)
-        now = datetime.datetime.now()
-        ts = now.strftime("%Y-%m-%d %H:%M:%S") + f".{now.microsecond//1000:03d}"
-        self.ble.send(f"SYNC:{ts}")
+        self.ble.send(sync_command())
         self.label_status.setText("Estado: sincronizando…")
 
     def update(self):
@@ -158,59 +109,78 @@ class MainWindow(QWidget):
         self.ble.send(f"SET:{buf},{freq}")
         self.label_status.setText("Estado: configurando…")
 
+    def toggle_live(self, enabled):
+        self.live.clear()
+        self.ble.set_live(enabled)
+        self.label_live.setText("Pared: esperando muestras…" if enabled else "Pared: sin datos en vivo")
+
     def fetch(self):
         self.btn_fetch.setEnabled(False)
-        fname = f"esp32_data_{time.strftime('%Y%m%d_%H%M%S')}.csv"
-        try:
-            self.csv_file = open(fname, "w", newline="", encoding="utf-8")
-            self.csv_writer = csv.writer(self.csv_file)
-            self.csv_writer.writerow(["timestamp","side","top","bottom"])
-            self.text_log.append(f"Guardando datos en {fname}")
-            self.csv_writing = True
-        except Exception as e:
-            self.text_log.append(f"Error al crear CSV: {e}")
-            self.csv_writing = False
-        self.ble.send("FETCH")
+        fname = default_capture_path()
+        # El archivo se abre y escribe en el hilo de CaptureWriter, nunca en el de la GUI
+        self._close_capture()
+        self.capture = CaptureWriter(fname)
+        if self.chk_filter.isChecked():
+            # Dropouts y lecturas atípicas se guardan como -1 en el propio CSV
+            self.capture = FilteringSink(self.capture)
+        self.text_log.append(f"Guardando datos en {fname}")
+        self.ble.fetch(self.capture, binary=self.chk_binary.isChecked(),
+                       window=self.spin_window.value())
         self.label_status.setText("Estado: solicitando…")
 
     def reset(self):
         self.btn_reset.setEnabled(False)
-        if self.csv_writing:
-            self.csv_file.close()
-            self.csv_writing = False
+        self.ble.abort_fetch()
+        self._close_capture()
         self.ble.send("RESET")
         self.label_status.setText("Estado: reiniciando…")
 
     def reset_gui(self):
-        if self.csv_writing:
-            self.csv_file.close()
-        self.csv_writing = False
-        self.csv_file = None
-        self.csv_writer = None
+        self.ble.abort_fetch()
+        self._close_capture()
         self.text_log.clear()
         self.label_status.setText("Estado: desconectado")
         self.label_mem.setText("Muestras posibles: N/A")
+        self.chk_live.setChecked(False)
         for btn in (self.btn_connect, self.btn_verify, self.btn_mem,
                     self.btn_sync, self.btn_fetch,
                     self.btn_reset, self.btn_update):
             btn.setEnabled(True)
 
+    def _check_closing(self):
+        # Capturas cerradas tras END cuyo hilo escritor aún no termina
+        for capture in list(self.closing):
+            if not capture.done:
+                continue
+            self.closing.remove(capture)
+            if capture.error:
+                self.text_log.append(f"Error al escribir CSV: {capture.error}")
+            else:
+                self.text_log.append(f"✅ CSV guardado: {capture.path} ({capture.rows} filas)")
+        # Un error de disco durante FETCH deja los bloques sin ACK: avisar y cortar
+        if self.capture and self.capture.error:
+            self.text_log.append(f"Error al escribir CSV: {self.capture.error}")
+            self.ble.abort_fetch()
+            self._close_capture()
+            self.btn_fetch.setEnabled(True)
+
     def _process_queue(self):
+        if self.chk_live.isChecked() and len(self.live):
+            self.label_live.setText(self.live.describe())
+        self._check_closing()
+
         while not self.msg_q.empty():
             msg = self.msg_q.get().strip()
 
-            if msg.startswith("WAIT_ACK:"):
-                block_id = msg.split(":")[1]
-                self.ble.send(f"ACK:BLOCK_{block_id}")
-                self.text_log.append(f"🟨 WAIT_ACK:{block_id} → ACK:BLOCK_{block_id}")
-                continue
-
             if msg == "END":
-                self.ble.send("ACK:BLOCK_9999")
-                if self.csv_writing:
-                    self.csv_file.close()
-                    self.csv_writing = False
-                    self.text_log.append("✅ CSV cerrado tras END")
+                if self.capture:
+                    # Sin esperar al hilo escritor: el resultado del último flush/fsync
+                    # se comprueba en los siguientes ticks (_check_closing)
+                    capture = self.capture
+                    self._close_capture()
+                    self.closing.append(capture)
+                    if isinstance(capture, FilteringSink):
+                        self.text_log.append(capture.filter.describe())
                 continue
 
             if msg.startswith("ESP32 libre:"):
@@ -245,18 +215,15 @@ class MainWindow(QWidget):
                 self.label_status.setText(f"Estado: {msg}")
             else:
                 self.text_log.append(msg)
-                if self.csv_writing:
-                    parts = msg.split(",")
-                    if len(parts) in (4, 5):
-                        try:
-                            float(parts[1]); int(parts[-3]); int(parts[-2]); int(parts[-1])
-                            self.csv_writer.writerow(parts[1:] if len(parts) == 5 else parts)
-                        except ValueError:
-                            pass
+
+    def _close_capture(self, wait=False):
+        if self.capture:
+            self.capture.close(wait=wait, timeout=5.0)
+            self.capture = None
 
     def closeEvent(self, event):
-        if self.csv_writing:
-            self.csv_file.close()
+        self.ble.abort_fetch()
+        self._close_capture(wait=True)
         self.ble.close()
         super().closeEvent(event)
 
@@ -0,0 +1,208 @@
+import os
+import sys
+import csv
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from calibration import cargar_perfil
+from frame_access import FrameAccess
+from gimbal import pitch_yaw
+from rectification import corregir_perspectiva
+from srt_telemetry import parse_srt_by_frame
+from telemetry_fusion import MODES, cargar_distancias, fusionar
+from temporal_join import TemporalJoin
+
+# === Rectificación en lote, sin GUI ===
+# Lo mismo que [W] en toolvideo para una lista de frames: el proceso principal
+# decodifica en orden creciente (FrameAccess salta de keyframe en keyframe) y la
+# corrección + codificación de cada imagen va a un pool de procesos. Como mucho hay
+# 2 trabajos por proceso en vuelo (memoria acotada con frames 4K) y los resultados
+# se recogen en orden, así el manifest sale ordenado por frame.
+# Reanudable: cada imagen se escribe con nombre temporal y se renombra al terminar;
+# al relanzar, las que ya existen se saltan. Todo frame pedido tiene su fila en el
+# manifest: status ok / existente, o sin_normal / sin_frame / error sin imagen.
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = ["frame", "path", "status", "pitch", "yaw", "normal_x", "normal_y", "normal_z"]
+
+
+def parse_frames(text):
+    # "10,20,30-40" → [10, 20, 30, ..., 40]
+    frames = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = (int(x) for x in part.split("-", 1))
+            frames.extend(range(a, b + 1))
+        else:
+            frames.append(int(part))
+    return frames
+
+
+def trabajos_desde_waypoints(path):
+    # _waypoints_full.csv de toolvideo: normal ya en el sistema de la cámara
+    df = pd.read_csv(path)
+    normals = df[["normal_x", "normal_y", "normal_z"]].to_numpy(dtype=float)
+    return [(int(f), n) for f, n in zip(df["frame"], normals)]
+
+
+def trabajos_desde_fusion(fused, frames):
+    # Frames fuera de la tabla fusionada quedan con normal NaN (→ sin_normal)
+    normals = np.column_stack([fused.cam_normal_x, fused.cam_normal_y, fused.cam_normal_z])
+    missing = np.full(3, np.nan)
+    return [(f, normals[f] if 0 <= f < len(fused) else missing) for f in frames]
+
+
+def salida_imagen(out_dir, base, frame_index, ext):
+    return os.path.join(out_dir, f"{os.path.basename(base)}_frame_{frame_index:04d}_corr.{ext}")
+
+
+def _rectificar(job):
+    # En el proceso del pool: corregir, codificar y escribir de forma atómica
+    frame_index, img, normal, path, label, params = job
+    pitch = yaw = None
+    if label:
+        pitch, yaw = (float(a) for a in pitch_yaw(normal))
+    corrected = corregir_perspectiva(img, normal, frame_index, pitch, yaw)
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.tmp{ext}"
+    if not cv2.imwrite(tmp, corrected, params):
+        raise OSError(f"no se pudo escribir {tmp}")
+    os.replace(tmp, path)
+    return path
+
+
+def rectificar_lote(video_path, jobs, out_dir, workers=None, ext="jpg", quality=95, label=False,
+                    overwrite=False, progress=True):
+    # jobs: [(frame, normal_cámara)]. Devuelve (escritas, existentes, omitidas, fallidas)
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.splitext(video_path)[0]
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if ext.lower() in ("jpg", "jpeg") else []
+    jobs = sorted(dict(jobs).items())  # orden creciente de frame y sin repetidos
+    workers = workers or os.cpu_count() or 1
+    written = existing = skipped = failed = 0
+    t0 = time.perf_counter()
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path, "w", newline="") as mf, \
+            FrameAccess(video_path, max_mb=64, ahead=0, behind=0, prefetch=False) as video, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        manifest = csv.writer(mf)
+        manifest.writerow(MANIFEST_FIELDS)
+        in_flight = deque()
+        max_in_flight = 2 * workers
+
+        def registrar(frame_index, normal, path, status):
+            # Sin imagen (path None) la fila queda con la ruta vacía; sin normal, sin ángulos
+            angles = ["", ""]
+            if np.all(np.isfinite(normal)):
+                angles = [f"{a:.3f}" for a in pitch_yaw(normal)]
+            manifest.writerow([frame_index, os.path.basename(path) if path else "", status,
+                               *angles, *("" if np.isnan(v) else f"{v:.6f}" for v in normal)])
+            mf.flush()
+
+        def recoger():
+            nonlocal written, failed
+            frame_index, normal, path, future = in_flight.popleft()
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                registrar(frame_index, normal, None, "error")
+                print(f"\n⚠️ frame {frame_index}: {e}", file=sys.stderr)
+            else:
+                written += 1
+                registrar(frame_index, normal, path, "ok")
+            if progress:
+                done = written + existing + skipped + failed
+                print(f"\r🖼️ {done}/{len(jobs)} ({written / (time.perf_counter() - t0):.1f} img/s)",
+                      end="", flush=True)
+
+        for frame_index, normal in jobs:
+            normal = np.asarray(normal, dtype=float)
+            path = salida_imagen(out_dir, base, frame_index, ext)
+            # Filas sin trabajo en el pool: antes se recoge lo pendiente para que el
+            # manifest siga en orden de frame
+            if not np.all(np.isfinite(normal)):
+                while in_flight:
+                    recoger()
+                skipped += 1
+                registrar(frame_index, normal, None, "sin_normal")
+                continue
+            if not overwrite and os.path.exists(path):
+                while in_flight:
+                    recoger()
+                existing += 1
+                registrar(frame_index, normal, path, "existente")
+                continue
+            img = video.read(frame_index)
+            if img is None:
+                while in_flight:
+                    recoger()
+                skipped += 1
+                registrar(frame_index, normal, None, "sin_frame")
+                continue
+            future = pool.submit(_rectificar, (frame_index, np.ascontiguousarray(img), normal, path, label, params))
+            in_flight.append((frame_index, normal, path, future))
+            while len(in_flight) >= max_in_flight:
+                recoger()
+        while in_flight:
+            recoger()
+    if progress:
+        print()
+    return written, existing, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corrección de perspectiva en lote (sin GUI)")
+    parser.add_argument("video", help="video MP4")
+    parser.add_argument("--srt", help="subtítulos .SRT (por defecto <video>.srt)")
+    parser.add_argument("--capture", help="captura de distancias (.csv o .scap)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--waypoints", help="_waypoints_full.csv de toolvideo (usa sus frames y normales)")
+    group.add_argument("--frames", type=parse_frames, help="lista de frames: 10,20,30-40")
+    group.add_argument("--stride", type=int, help="uno de cada N frames")
+    parser.add_argument("-o", "--output", help="carpeta de salida (por defecto <video>_rectified/)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--ext", default="jpg", choices=["jpg", "png"])
+    parser.add_argument("--quality", type=int, default=95, help="calidad JPEG")
+    parser.add_argument("--mode", choices=MODES, default="linear", help="interpolación de distancias")
+    parser.add_argument("--calibration", help="perfil de calibración JSON")
+    parser.add_argument("--label", action="store_true", help="escribir frame, pitch y yaw en la imagen")
+    parser.add_argument("--overwrite", action="store_true", help="rehacer también las imágenes existentes")
+    args = parser.parse_args(argv)
+
+    base = os.path.splitext(args.video)[0]
+    try:
+        if args.waypoints:
+            jobs = trabajos_desde_waypoints(args.waypoints)
+        else:
+            if not args.capture:
+                parser.error("hace falta --capture (o --waypoints)")
+            srt_path = args.srt or base + ".srt"
+            join = TemporalJoin.from_dataframe(cargar_distancias(args.capture))
+            perfil = cargar_perfil(args.calibration)
+            fused = fusionar(parse_srt_by_frame(srt_path), join, mode=args.mode, perfil=perfil)
+            frames = args.frames or list(range(0, len(fused), args.stride or 1))
+            jobs = trabajos_desde_fusion(fused, frames)
+        out_dir = args.output or base + "_rectified"
+        written, existing, skipped, failed = rectificar_lote(args.video, jobs, out_dir, workers=args.workers, ext=args.ext,
+                                                     quality=args.quality, label=args.label,
+                                                     overwrite=args.overwrite)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"✅ {written} imágenes nuevas, {existing} ya existentes, {skipped} sin normal o sin frame, "
+          f"{failed} con error → {out_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,224 @@
+import queue
+import asyncio
+import datetime
+import threading
+
+from bleak import BleakScanner, BleakClient
+
+from ble_protocol import (
+    BIN_MAGIC, LIVE_MAGIC, BIN_MAX_PAYLOAD, FINAL_ACK_BLOCK, MAX_WINDOW,
+    BinaryFetchDecoder, TextFetchDecoder, FrameError, decode_frame
+)
+
+SERVICE_UUID = "12345678-1234-1234-1234-1234567890ab"
+CHAR_UUID    = "abcd1234-5678-90ab-cdef-1234567890ab"
+ESP32_ADDR   = "1773840C-16AD-9822-65C7-87488BCE5B7C"
+
+
+def sync_command(now=None):
+    now = now or datetime.datetime.now()
+    ts = now.strftime("%Y-%m-%d %H:%M:%S") + f".{now.microsecond//1000:03d}"
+    return f"SYNC:{ts}"
+
+
+class BLEManager:
+    def __init__(self, msg_q, client_factory=None, window=8, address=ESP32_ADDR, loop=None):
+        self.msg_q = msg_q
+        self.address = address
+        # Con loop, el manager comparte el hilo de asyncio de otro (ver device_sessions.py)
+        self.owns_loop = loop is None
+        self.loop   = loop or asyncio.new_event_loop()
+        self.client = None
+        # Permite sustituir BleakClient (p. ej. por fake_esp32.FakeESP32Client)
+        self.client_factory = client_factory
+        self.decoder = None
+        # Bloques en vuelo permitidos al firmware antes de exigir un ACK
+        self.window = window
+        self._fetch_done = None
+        # Callable que recibe los registros (ts_ms, d1, d2, d3) del modo en vivo
+        self.live_sink = None
+        if self.owns_loop:
+            threading.Thread(target=self._run_loop, daemon=True).start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def connect(self):
+        return asyncio.run_coroutine_threadsafe(self._connect(), self.loop)
+
+    async def _connect(self, device=None):
+        # device: BLEDevice ya descubierto; evita un escaneo nuevo por conexión
+        if device is not None:
+            address = device
+        elif self.client_factory:
+            address = self.address
+        else:
+            self.msg_q.put("Buscando ESP32...")
+            devices = await BleakScanner.discover(timeout=5.0)
+            target = next((d for d in devices if d.address.upper() == self.address.upper()), None)
+            if not target:
+                self.msg_q.put("No se encontró ESP32 por dirección")
+                return False
+            address = target.address
+        self.msg_q.put(f"Intentando conectar a {getattr(address, 'address', address)}")
+        self.client = (self.client_factory or BleakClient)(address)
+        try:
+            await self.client.connect()
+            self.msg_q.put("Conectado al ESP32")
+            await self.client.start_notify(CHAR_UUID, self._notification_handler)
+            return True
+        except Exception as e:
+            self.msg_q.put(f"Error BLE: {e}")
+            return False
+
+    def _notification_handler(self, sender, data):
+        # Se ejecuta en el hilo de asyncio: los ACK salen desde aquí, sin pasar por el QTimer
+        if data[:1] == bytes((LIVE_MAGIC,)):
+            self._on_live(data)
+            return
+        decoder = self.decoder
+        if data[:1] == bytes((BIN_MAGIC,)):
+            # Sin decodificador (p. ej. tras abort_fetch) las tramas binarias que
+            # aún lleguen se descartan: no son texto
+            if decoder is not None:
+                try:
+                    decoder.feed(data)
+                except FrameError as e:
+                    self.msg_q.put(f"DBG: trama descartada: {e}")
+            return
+        text = data.decode("utf-8").strip()
+        if isinstance(decoder, TextFetchDecoder) and decoder.feed(text) is not None:
+            return
+        if text.startswith("WAIT_ACK:"):
+            self._on_wait_ack(text)
+            return
+        if text == "END":
+            self._ack(FINAL_ACK_BLOCK)
+            if decoder is not None:
+                self.msg_q.put(decoder.summary())
+                self.decoder = None
+            if self._fetch_done is not None:
+                self._fetch_done.set()
+        self.msg_q.put(text)
+
+    def _on_live(self, data):
+        if self.live_sink is None:
+            return
+        try:
+            _, records = decode_frame(data, LIVE_MAGIC)
+        except FrameError as e:
+            self.msg_q.put(f"DBG: trama en vivo descartada: {e}")
+            return
+        self.live_sink(records)
+
+    def _on_wait_ack(self, text):
+        # WAIT_ACK:<bloque>:<índice final>. El ACK es acumulativo: sólo se confirma
+        # un bloque cuando todas las muestras hasta su final llegaron en orden; si
+        # falta alguna se calla y el firmware reenvía desde el último ACK.
+        parts = text.split(":")
+        block = int(parts[1])
+        decoder = self.decoder
+        if decoder is not None and len(parts) > 2 and not decoder.block_complete(int(parts[2])):
+            self.msg_q.put(f"🟥 WAIT_ACK:{block} incompleto (recibidas {decoder.next_index})")
+            return
+        if decoder is None or not hasattr(decoder.sink, "mark_block"):
+            self._ack_block(decoder, block)
+            return
+        # El ESP32 libera el bloque al recibir su ACK: antes tiene que estar en
+        # disco. El escritor avisa tras el fsync (desde su hilo)
+        try:
+            decoder.sink.mark_block(lambda: self._call_soon(self._ack_block, decoder, block))
+        except queue.Full:
+            self.msg_q.put(f"🟥 WAIT_ACK:{block} sin ACK (escritura saturada)")
+
+    def _call_soon(self, callback, *args):
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # loop ya cerrado
+
+    def _ack_block(self, decoder, block):
+        self._ack(block)
+        if decoder is not None:
+            decoder.blocks = max(decoder.blocks, block + 1)
+        self.msg_q.put(f"🟨 WAIT_ACK:{block} → ACK:BLOCK_{block}")
+
+    def _ack(self, block):
+        self.loop.create_task(self._write_ack(f"ACK:BLOCK_{block}"))
+
+    async def _write_ack(self, cmd):
+        # Escritura sin respuesta: el ACK no paga un round trip GATT
+        try:
+            await self.client.write_gatt_char(CHAR_UUID, cmd.encode("utf-8"), response=False)
+        except Exception as e:
+            self.msg_q.put(f"DBG: error al enviar {cmd}: {e}")
+
+    async def _send(self, cmd):
+        if self.client and self.client.is_connected:
+            self.msg_q.put(f"DBG: enviando '{cmd}'")
+            try:
+                await self.client.write_gatt_char(CHAR_UUID, cmd.encode("utf-8"), response=True)
+                self.msg_q.put(f"DBG: '{cmd}' enviado (request)")
+                return True
+            except Exception as e:
+                self.msg_q.put(f"DBG: error al enviar: {e}")
+        else:
+            self.msg_q.put("No conectado. Presiona 'Conectar ESP32' primero.")
+        return False
+
+    def send(self, cmd):
+        return asyncio.run_coroutine_threadsafe(self._send(cmd), self.loop)
+
+    def _start_fetch(self, sink, binary, window):
+        # Las muestras se escriben en sink (p. ej. csv.writer) desde el hilo de asyncio.
+        # Texto: una muestra por notificación. Binario: tramas FETCH_BIN del tamaño del MTU.
+        window = max(1, min(window or self.window, MAX_WINDOW))
+        if not binary:
+            self.decoder = TextFetchDecoder(sink)
+            return f"WINDOW:{window}", "FETCH"
+        self.decoder = BinaryFetchDecoder(sink)
+        payload = BIN_MAX_PAYLOAD
+        if self.client is not None:
+            payload = min(payload, getattr(self.client, "mtu_size", 23) - 3)
+        return f"WINDOW:{window}", f"FETCH_BIN:{payload}"
+
+    def fetch(self, sink, binary=False, window=None):
+        window_cmd, fetch_cmd = self._start_fetch(sink, binary, window)
+        self.send(window_cmd)
+        return self.send(fetch_cmd)
+
+    async def fetch_async(self, sink, binary=False, window=None, timeout=15.0):
+        # Corrutina para el hilo de asyncio: devuelve el decoder al llegar END,
+        # o None si pasan `timeout` segundos sin muestras nuevas.
+        self._fetch_done = asyncio.Event()
+        window_cmd, fetch_cmd = self._start_fetch(sink, binary, window)
+        decoder = self.decoder
+        if not (await self._send(window_cmd) and await self._send(fetch_cmd)):
+            self.decoder = None
+            return None
+        progress = -1
+        while not self._fetch_done.is_set():
+            if decoder.next_index == progress:
+                self.decoder = None
+                return None
+            progress = decoder.next_index
+            try:
+                await asyncio.wait_for(self._fetch_done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return decoder
+
+    def set_live(self, enabled):
+        return self.send(f"LIVE:{1 if enabled else 0}")
+
+    def abort_fetch(self):
+        self.decoder = None
+
+    def is_connected(self):
+        return bool(self.client and self.client.is_connected)
+
+    def close(self):
+        if self.client:
+            return asyncio.run_coroutine_threadsafe(self.client.disconnect(), self.loop)
+        return None
@@ -0,0 +1,167 @@
+import time
+import queue
+import struct
+import binascii
+
+# === Protocolo binario de FETCH (FETCH_BIN) ===
+# Cada notificación lleva varios SensorData empaquetados:
+#   [magic u8][índice de la primera muestra u16][n u8][n × registro][crc16 u16]
+# Todo en little-endian, igual que la memoria del ESP32.
+BIN_MAGIC = 0xB1
+LIVE_MAGIC = 0xB2  # misma trama con la muestra recién tomada (modo en vivo)
+HEADER = struct.Struct("<BHB")
+RECORD = struct.Struct("<Qhhh")  # timestamp ms, dist1 (side), dist2 (top), dist3 (bottom)
+CRC = struct.Struct("<H")
+BIN_MAX_PAYLOAD = 512
+BIN_MIN_PAYLOAD = 20  # MTU por defecto (23) menos 3 bytes de cabecera ATT
+FINAL_ACK_BLOCK = 9999
+MAX_WINDOW = 32
+
+
+def reloj_esp32_ms(now=None):
+    # Epoch del firmware en ms: SYNC le envía la hora local de pared y mktime (sin TZ)
+    # la toma como UTC, así sus timestamps van adelantados/atrasados en tm_gmtoff
+    now = time.time() if now is None else now
+    return (now + time.localtime(now).tm_gmtoff) * 1000.0
+
+
+class FrameError(ValueError):
+    pass
+
+
+def crc16(data):
+    # CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), mismo cálculo que el firmware
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def records_per_frame(payload):
+    payload = max(BIN_MIN_PAYLOAD, min(payload, BIN_MAX_PAYLOAD))
+    return max(1, (payload - HEADER.size - CRC.size) // RECORD.size)
+
+
+def encode_frame(first_index, records, magic=BIN_MAGIC):
+    body = HEADER.pack(magic, first_index, len(records))
+    body += b"".join(RECORD.pack(*r) for r in records)
+    return body + CRC.pack(crc16(body))
+
+
+def check_frame(data, magic=BIN_MAGIC):
+    # Valida longitud, magic y CRC; devuelve el offset donde termina el último registro
+    if len(data) < HEADER.size + CRC.size:
+        raise FrameError(f"trama corta ({len(data)} bytes)")
+    found, first, n = HEADER.unpack_from(data)
+    end = HEADER.size + n * RECORD.size
+    if found != magic or len(data) != end + CRC.size:
+        raise FrameError(f"cabecera inválida (magic={found:#x}, n={n}, len={len(data)})")
+    if CRC.unpack_from(data, end)[0] != crc16(bytes(data[:end])):
+        raise FrameError(f"CRC incorrecto en trama {first}")
+    return end
+
+
+def decode_frame(data, magic=BIN_MAGIC):
+    end = check_frame(data, magic)
+    _, first, _ = HEADER.unpack_from(data)
+    return first, list(RECORD.iter_unpack(memoryview(data)[HEADER.size:end]))
+
+
+def format_row(ts_ms, d1, d2, d3):
+    # Misma representación que el CSV de texto: "segundos.milisegundos"
+    return (f"{ts_ms // 1000}.{ts_ms % 1000:03d}", d1, d2, d3)
+
+
+class FetchDecoder:
+    # Estado común de una transferencia FETCH: las muestras llegan numeradas y
+    # sólo se escriben en orden (go-back-N), así los reenvíos no duplican filas.
+    # Si el sink está saturado (queue.Full) la trama se trata como perdida: no
+    # avanza next_index, el bloque no se confirma y el ESP32 lo reenvía.
+    def __init__(self, sink):
+        self.sink = sink
+        self.next_index = 0
+        self.frames = 0
+        self.samples = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.saturated = 0
+        self.blocks = 0
+        self.started = time.perf_counter()
+
+    def _accept(self, first, n):
+        # Devuelve cuántos registros iniciales saltar, o None si hay que descartar todo
+        if first > self.next_index:
+            self.out_of_order += n
+            return None
+        skip = self.next_index - first
+        if skip >= n:
+            self.duplicates += n
+            return None
+        self.duplicates += skip
+        return skip
+
+    def _write(self, rows):
+        try:
+            self.sink.writerows(rows)
+            return True
+        except queue.Full:
+            self.saturated += len(rows)
+            return False
+
+    def block_complete(self, end_index):
+        return self.next_index >= end_index
+
+    def blocks_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return self.blocks / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"📦 {self.samples} muestras en {self.frames} tramas / {self.blocks} bloques "
+                f"({self.blocks_per_second():.1f} bloques/s; descartadas {self.rejected} / "
+                f"duplicadas {self.duplicates} / fuera de orden {self.out_of_order} / "
+                f"sin espacio en cola {self.saturated})")
+
+
+class TextFetchDecoder(FetchDecoder):
+    # FETCH de texto: "índice,timestamp,d1,d2,d3" por notificación
+    def feed(self, text):
+        parts = text.split(",")
+        if len(parts) != 5:
+            return None
+        try:
+            index = int(parts[0]); float(parts[1]); int(parts[2]); int(parts[3]); int(parts[4])
+        except ValueError:
+            return None
+        self.frames += 1
+        if self._accept(index, 1) is None:
+            return 0
+        if not self._write([parts[1:]]):
+            return 0
+        self.samples += 1
+        self.next_index = index + 1
+        return 1
+
+
+class BinaryFetchDecoder(FetchDecoder):
+    # Decodifica tramas FETCH_BIN y escribe las filas directamente en `sink`
+    # (cualquier objeto con writerows, p. ej. csv.writer).
+    def feed(self, data):
+        end = self._validate(data)
+        _, first, n = HEADER.unpack_from(data)
+        self.frames += 1
+
+        skip = self._accept(first, n)
+        if skip is None:
+            return 0
+        view = memoryview(data)[HEADER.size + skip * RECORD.size:end]
+        rows = [format_row(*r) for r in RECORD.iter_unpack(view)]
+        if not self._write(rows):
+            return 0
+        self.samples += len(rows)
+        self.next_index = first + n
+        return len(rows)
+
+    def _validate(self, data):
+        try:
+            return check_frame(data)
+        except FrameError:
+            self.rejected += 1
+            raise
@@ -1,37 +1,38 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Cargar datos
-df = pd.read_csv("calibration_data.csv")
+from calibration import guardar_perfil
+from calibration_solver import ajustar_calibracion, cargar_sesiones
 
-# Filtrar solo valores válidos (evitar divisiones por cero o NaN)
-df = df[(df["z_real_mm"] > 0) & (df["side_avg_mm"] > 0) & (df["top_avg_mm"] > 0)]
-
-# Calcular ángulos de inclinación reales
-df["angle_side_deg"] = np.degrees(np.arccos(df["z_real_mm"] / df["side_avg_mm"]))
-df["angle_top_deg"]  = np.degrees(np.arccos(df["z_real_mm"] / df["top_avg_mm"]))
-
-# Resultados promedio
-mean_side = df["angle_side_deg"].mean()
-mean_top = df["angle_top_deg"].mean()
+# Ajuste conjunto (ángulos + sesgos + distancia de cada sesión) sobre las muestras
+# crudas de data/, en lugar de arccos(z_real / promedio) fila a fila
+sessions = cargar_sesiones(["data"])
+result = ajustar_calibracion(sessions)
+perfil = result.perfil
 
 # Mostrar por consola
-print("Ángulos estimados por distancia:")
-print(df[["z_real_mm", "angle_side_deg", "angle_top_deg"]])
+print(result.report())
 print("\n-------------------------------")
-print(f"✅ Ángulo promedio SIDE: {mean_side:.2f}°")
-print(f"✅ Ángulo promedio TOP : {mean_top:.2f}°")
+print(f"✅ Ángulo SIDE: {perfil.theta_side_deg:.2f}°  (sesgo {perfil.bias_side:+.1f} mm)")
+print(f"✅ Ángulo TOP : {perfil.theta_top_deg:.2f}°  (sesgo {perfil.bias_top:+.1f} mm)")
+print(f"💾 Perfil guardado en {guardar_perfil(perfil)}")
+
+# Plot: lecturas por sesión frente a la distancia ajustada, con el modelo
+z = np.array([result.distances[s.name][0] for s in sessions])
+side = np.array([np.nanmean(s.readings[1]) for s in sessions])
+top = np.array([np.nanmean(s.readings[2]) for s in sessions])
+z_line = np.linspace(z.min(), z.max(), 100)
 
-# Plot
 plt.figure(figsize=(8, 4))
-plt.plot(df["z_real_mm"], df["angle_side_deg"], 'o-', label="side angle")
-plt.plot(df["z_real_mm"], df["angle_top_deg"], 's-', label="top angle")
-plt.axhline(mean_side, color='blue', linestyle='--', label=f"Mean side = {mean_side:.2f}°")
-plt.axhline(mean_top, color='orange', linestyle='--', label=f"Mean top = {mean_top:.2f}°")
+plt.plot(z, side - z, 'o', label="side - z")
+plt.plot(z, top - z, 's', label="top - z")
+plt.plot(z_line, z_line / np.cos(np.radians(perfil.theta_side_deg)) + perfil.bias_side - z_line,
+         color='blue', linestyle='--', label=f"modelo side ({perfil.theta_side_deg:.2f}°)")
+plt.plot(z_line, z_line / np.cos(np.radians(perfil.theta_top_deg)) + perfil.bias_top - z_line,
+         color='orange', linestyle='--', label=f"modelo top ({perfil.theta_top_deg:.2f}°)")
 plt.xlabel("Distancia real (mm)")
-plt.ylabel("Ángulo estimado (°)")
-plt.title("Ángulos estimados de los sensores inclinados")
+plt.ylabel("Exceso de lectura (mm)")
+plt.title("Calibración conjunta de los sensores inclinados")
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
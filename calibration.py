@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+# === Perfil de calibración de los sensores ===
+# Los ángulos de montaje y las posiciones relativas de side/top respecto a bottom
+# viven en un JSON (calibration.json por defecto, uno por placa si hace falta).
+# Al cargar un perfil se precalculan una sola vez los vectores unitarios y los
+# orígenes de los tres sensores; las funciones de geometría reciben el perfil y
+# no repiten trigonometría por muestra.
+# Los perfiles se cachean por hash del contenido, y cada ruta recuerda su
+# (mtime, tamaño): recargar un archivo que no cambió no lo vuelve a leer.
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json")
+FIELDS = ("theta_side_deg", "theta_top_deg", "delta_x_side", "delta_y_top")
+DEFAULTS = {
+    "theta_side_deg": 16.09,  # inclinación horizontal
+    "theta_top_deg": 14.54,   # inclinación vertical
+    "delta_x_side": -60.0,    # mm (izquierda de bottom)
+    "delta_y_top": 25.0,      # mm (encima de bottom)
+}
+# Sesgo de rango por sensor (mm, lectura - distancia real); opcional en el JSON
+BIAS_FIELDS = ("bias_bottom", "bias_side", "bias_top")
+
+_by_hash = {}
+_by_path = {}
+
+
+class CalibrationError(ValueError):
+    pass
+
+
+class CalibrationProfile:
+    def __init__(self, theta_side_deg, theta_top_deg, delta_x_side, delta_y_top, name="default",
+                 bias_bottom=0.0, bias_side=0.0, bias_top=0.0):
+        self.name = name
+        self.theta_side_deg = float(theta_side_deg)
+        self.theta_top_deg = float(theta_top_deg)
+        self.delta_x_side = float(delta_x_side)
+        self.delta_y_top = float(delta_y_top)
+        self.bias_bottom = float(bias_bottom)
+        self.bias_side = float(bias_side)
+        self.bias_top = float(bias_top)
+
+        theta_side = np.radians(self.theta_side_deg)
+        theta_top = np.radians(self.theta_top_deg)
+        # Filas: bottom, side, top
+        self.vectors = np.array([
+            [0.0, 0.0, -1.0],                                  # referencia perpendicular
+            [np.sin(theta_side), 0.0, -np.cos(theta_side)],    # horizontal
+            [0.0, np.sin(theta_top), -np.cos(theta_top)],      # vertical
+        ])
+        self.origins = np.array([
+            [0.0, 0.0, 0.0],
+            [self.delta_x_side, 0.0, 0.0],
+            [0.0, self.delta_y_top, 0.0],
+        ])
+        self.bias = np.array([self.bias_bottom, self.bias_side, self.bias_top])
+        self.vectors.flags.writeable = False
+        self.origins.flags.writeable = False
+        self.bias.flags.writeable = False
+
+    @classmethod
+    def from_dict(cls, data, name=None):
+        missing = [k for k in FIELDS if k not in data]
+        if missing:
+            raise CalibrationError(f"faltan campos de calibración: {', '.join(missing)}")
+        bias = {k: data[k] for k in BIAS_FIELDS if k in data}
+        return cls(*(data[k] for k in FIELDS), name=name or data.get("name", "default"), **bias)
+
+    def to_dict(self):
+        data = {"name": self.name}
+        data.update({k: getattr(self, k) for k in FIELDS + BIAS_FIELDS})
+        return data
+
+    def __repr__(self):
+        text = (f"CalibrationProfile({self.name!r}: side {self.theta_side_deg:.2f}°, "
+                f"top {self.theta_top_deg:.2f}°, Δx {self.delta_x_side:g} mm, Δy {self.delta_y_top:g} mm")
+        if self.bias.any():
+            text += f", sesgo b/s/t {self.bias_bottom:+.1f}/{self.bias_side:+.1f}/{self.bias_top:+.1f} mm"
+        return text + ")"
+
+
+def perfil_por_defecto():
+    key = "default"
+    if key not in _by_hash:
+        _by_hash[key] = CalibrationProfile(**DEFAULTS)
+    return _by_hash[key]
+
+
+def cargar_perfil(path=None):
+    # Sin archivo de calibración se usan los valores históricos (DEFAULTS)
+    path = os.path.abspath(path or DEFAULT_PROFILE_PATH)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        if path == DEFAULT_PROFILE_PATH:
+            return perfil_por_defecto()
+        raise
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _by_path.get(path)
+    if cached and cached[0] == stamp:
+        return _by_hash[cached[1]]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    if digest not in _by_hash:
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except ValueError as e:
+            raise CalibrationError(f"{path}: JSON inválido ({e})") from e
+        name = data.get("name") or os.path.splitext(os.path.basename(path))[0]
+        _by_hash[digest] = CalibrationProfile.from_dict(data, name=name)
+    _by_path[path] = (stamp, digest)
+    return _by_hash[digest]
+
+
+def guardar_perfil(perfil, path=None):
+    path = path or DEFAULT_PROFILE_PATH
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(perfil.to_dict(), f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,229 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from calibration import CalibrationProfile, cargar_perfil, guardar_perfil
+from capture_format import CAPTURE_EXT, cargar_captura
+from distance_filters import filtrar_dataframe
+
+# === Calibración conjunta por mínimos cuadrados ===
+# Cada sesión de calibración es una captura frente a una pared plana (data/*.csv).
+# La distancia real Z de cada sesión es una incógnita más; bottom es la referencia
+# (sesgo 0), y side/top se modelan como la intersección de su rayo con la pared:
+#   t = n · ((0, 0, -Z) - o) / (n · v),   lectura = t + sesgo
+# con n la normal de la pared en el sistema de los sensores, v/o el vector y el
+# origen de cada sensor (ver CalibrationProfile) y sesgo el error de rango.
+# Se ajustan a la vez ángulos, sesgos y las Z de cada sesión sobre todas las
+# muestras crudas (Levenberg–Marquardt en NumPy, jacobiano por diferencias).
+# Con la pared paralela al plano de los sensores los desplazamientos Δx/Δy no
+# cambian ninguna lectura: sólo se ajustan si alguna sesión tiene la pared inclinada
+# (--tilt archivo=yaw,pitch); si no, se mantienen los del perfil actual.
+PARAMS = ("theta_side_deg", "theta_top_deg", "delta_x_side", "delta_y_top", "bias_side", "bias_top")
+SENSORS = ("bottom", "side", "top")  # mismo orden que CalibrationProfile.vectors
+Z95 = 1.959964
+
+
+class SolverError(ValueError):
+    pass
+
+
+class CalibrationSession:
+    def __init__(self, name, bottom, side, top, wall_yaw_deg=0.0, wall_pitch_deg=0.0):
+        self.name = name
+        self.readings = (np.asarray(bottom, dtype=float), np.asarray(side, dtype=float),
+                         np.asarray(top, dtype=float))
+        self.wall_yaw_deg = wall_yaw_deg
+        self.wall_pitch_deg = wall_pitch_deg
+
+    @property
+    def tilted(self):
+        return bool(self.wall_yaw_deg or self.wall_pitch_deg)
+
+    def wall_normal(self):
+        n = np.array([np.tan(np.radians(self.wall_yaw_deg)), np.tan(np.radians(self.wall_pitch_deg)), 1.0])
+        return n / np.linalg.norm(n)
+
+
+def cargar_sesiones(paths, tilts=None):
+    # paths: archivos o carpetas con capturas (.csv / .scap); tilts: {nombre: (yaw, pitch)}
+    tilts = tilts or {}
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.endswith((".csv", CAPTURE_EXT)))
+        else:
+            files.append(p)
+    sessions = []
+    for path in files:
+        df = filtrar_dataframe(cargar_captura(path))
+        name = os.path.basename(path)
+        yaw, pitch = tilts.get(name, (0.0, 0.0))
+        sessions.append(CalibrationSession(name, df["bottom"], df["side"], df["top"], yaw, pitch))
+    return sessions
+
+
+def levenberg_marquardt(fun, x0, max_iter=100, tol=1e-10, step=1e-6):
+    # Minimiza ||fun(x)||²; devuelve x, residuos, jacobiano en la solución e iteraciones
+    x = np.asarray(x0, dtype=float).copy()
+    r = fun(x)
+    cost = r @ r
+    lam = 1e-3
+
+    def jacobian(x, r):
+        J = np.empty((len(r), len(x)))
+        for i in range(len(x)):
+            h = step * max(1.0, abs(x[i]))
+            xh = x.copy()
+            xh[i] += h
+            J[:, i] = (fun(xh) - r) / h
+        return J
+
+    J = jacobian(x, r)
+    for it in range(1, max_iter + 1):
+        A = J.T @ J
+        g = J.T @ r
+        while True:
+            delta = np.linalg.solve(A + lam * np.diag(np.maximum(np.diag(A), 1e-12)), -g)
+            r_new = fun(x + delta)
+            cost_new = r_new @ r_new
+            if cost_new < cost:
+                lam = max(lam / 10, 1e-12)
+                break
+            lam *= 10
+            if lam > 1e12:
+                return x, r, J, it
+        converged = cost - cost_new <= tol * max(cost, 1.0)
+        x, r, cost = x + delta, r_new, cost_new
+        J = jacobian(x, r)
+        if converged:
+            break
+    return x, r, J, it
+
+
+class CalibrationResult:
+    def __init__(self, perfil, values, stderr, free, rms, counts, distances, iterations):
+        self.perfil = perfil
+        self.values = values
+        self.stderr = stderr
+        self.free = free
+        self.rms = rms
+        self.counts = counts
+        self.distances = distances
+        self.iterations = iterations
+
+    def report(self):
+        lines = [f"🔧 Ajuste en {self.iterations} iteraciones, {sum(self.counts.values())} lecturas"]
+        for k in PARAMS:
+            if k in self.free:
+                ci = Z95 * self.stderr[k]
+                lines.append(f"   {k:15s} {self.values[k]:9.3f} ± {ci:.3f}  (IC 95%)")
+            else:
+                lines.append(f"   {k:15s} {self.values[k]:9.3f}  (fijo, no identificable)")
+        for s in SENSORS:
+            lines.append(f"   residuo {s:6s} RMS {self.rms[s]:6.2f} mm  ({self.counts[s]} lecturas)")
+        for name, (z, ez) in self.distances.items():
+            lines.append(f"   {name:12s} Z = {z:8.1f} ± {Z95 * ez:.1f} mm")
+        return "\n".join(lines)
+
+
+def ajustar_calibracion(sessions, perfil=None, fit_offsets=None, name=None):
+    if not sessions:
+        raise SolverError("no hay sesiones de calibración")
+    perfil = perfil or cargar_perfil()
+    if fit_offsets is None:
+        fit_offsets = any(s.tilted for s in sessions)
+
+    # Observaciones válidas, aplanadas: sensor, sesión, lectura, normal de la pared
+    sensor_idx, sess_idx, meas = [], [], []
+    for k, s in enumerate(sessions):
+        for i, values in enumerate(s.readings):
+            ok = ~np.isnan(values)
+            meas.append(values[ok])
+            sensor_idx.append(np.full(ok.sum(), i))
+            sess_idx.append(np.full(ok.sum(), k))
+    meas, sensor_idx, sess_idx = np.concatenate(meas), np.concatenate(sensor_idx), np.concatenate(sess_idx)
+    normals = np.array([s.wall_normal() for s in sessions])[sess_idx]
+    for i, s in enumerate(SENSORS):
+        if not np.any(sensor_idx == i):
+            raise SolverError(f"ninguna lectura válida de {s}")
+
+    base = np.array([perfil.theta_side_deg, perfil.theta_top_deg, perfil.delta_x_side,
+                     perfil.delta_y_top, perfil.bias_side - perfil.bias_bottom,
+                     perfil.bias_top - perfil.bias_bottom])
+    free = [0, 1, 4, 5] + ([2, 3] if fit_offsets else [])
+    z0 = np.array([np.nanmedian(s.readings[0]) for s in sessions])
+    x0 = np.concatenate([base[free], z0])
+
+    def unpack(x):
+        p = base.copy()
+        p[free] = x[:len(free)]
+        return p, x[len(free):]
+
+    def model(x):
+        p, Z = unpack(x)
+        ts, tt = np.radians(p[0]), np.radians(p[1])
+        v = np.array([[0.0, 0.0, -1.0], [np.sin(ts), 0.0, -np.cos(ts)], [0.0, np.sin(tt), -np.cos(tt)]])
+        o = np.array([[0.0, 0.0, 0.0], [p[2], 0.0, 0.0], [0.0, p[3], 0.0]])
+        bias = np.array([0.0, p[4], p[5]])
+        anchor = np.zeros((len(meas), 3))
+        anchor[:, 2] = -Z[sess_idx]
+        num = np.einsum("ij,ij->i", normals, anchor - o[sensor_idx])
+        den = np.einsum("ij,ij->i", normals, v[sensor_idx])
+        return num / den + bias[sensor_idx] - meas
+
+    x, r, J, iterations = levenberg_marquardt(model, x0)
+    dof = len(r) - len(x)
+    if dof <= 0:
+        raise SolverError("más parámetros que lecturas")
+    sigma2 = (r @ r) / dof
+    try:
+        cov = sigma2 * np.linalg.inv(J.T @ J)
+    except np.linalg.LinAlgError as e:
+        raise SolverError("jacobiano singular: geometría no identificable con estas sesiones") from e
+    err = np.sqrt(np.diag(cov))
+
+    p, Z = unpack(x)
+    values = dict(zip(PARAMS, p))
+    stderr = dict(zip([PARAMS[i] for i in free], err[:len(free)]))
+    rms = {s: float(np.sqrt(np.mean(r[sensor_idx == i] ** 2))) for i, s in enumerate(SENSORS)}
+    counts = {s: int(np.sum(sensor_idx == i)) for i, s in enumerate(SENSORS)}
+    distances = {s.name: (z, e) for s, z, e in zip(sessions, Z, err[len(free):])}
+    fitted = CalibrationProfile(p[0], p[1], p[2], p[3], name=name or perfil.name,
+                                bias_bottom=0.0, bias_side=p[4], bias_top=p[5])
+    return CalibrationResult(fitted, values, stderr, set(stderr), rms, counts, distances, iterations)
+
+
+def _parse_tilt(text):
+    try:
+        name, angles = text.split("=", 1)
+        yaw, pitch = (float(a) for a in angles.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"se esperaba archivo=yaw,pitch: {text!r}")
+    return name, (yaw, pitch)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibración conjunta de los sensores VL53L1X")
+    parser.add_argument("paths", nargs="*", default=["data"], help="capturas o carpetas (por defecto data/)")
+    parser.add_argument("--tilt", type=_parse_tilt, action="append", default=[],
+                        help="inclinación conocida de la pared en una sesión: archivo=yaw,pitch (grados)")
+    parser.add_argument("-o", "--output", help="perfil JSON a escribir (por defecto calibration.json)")
+    parser.add_argument("--name", help="nombre del perfil")
+    parser.add_argument("--dry-run", action="store_true", help="no escribir el perfil")
+    args = parser.parse_args(argv)
+
+    try:
+        result = ajustar_calibracion(cargar_sesiones(args.paths, dict(args.tilt)), name=args.name)
+    except SolverError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(result.report())
+    if not args.dry_run:
+        print(f"✅ Perfil guardado en {guardar_perfil(result.perfil, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
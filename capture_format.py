@@ -0,0 +1,137 @@
+import os
+import sys
+import struct
+
+import numpy as np
+import pandas as pd
+
+# === Formato binario de capturas (.scap) ===
+# Alternativa compacta al CSV esp32_data_*.csv:
+#   cabecera (64 bytes) | n registros SensorData | índice disperso de timestamps
+# Cada registro es el SensorData del firmware sin relleno: uint64 timestamp en ms y
+# tres int16 (side, top, bottom) = 14 bytes. El índice guarda el timestamp de uno de
+# cada `stride` registros para buscar por tiempo sin recorrer todo el archivo.
+# La carga es un np.memmap: las columnas son vistas sobre el archivo, sin copias.
+CAPTURE_EXT = ".scap"
+MAGIC = b"SCAP"
+VERSION = 1
+RECORD_DTYPE = np.dtype([("timestamp", "<u8"), ("side", "<i2"), ("top", "<i2"), ("bottom", "<i2")])
+HEADER = struct.Struct("<4sHHQQQI28x")  # magic, versión, tamaño registro, n, offset datos, offset índice, stride
+DEFAULT_STRIDE = 256
+COLUMNS = ["timestamp", "side", "top", "bottom"]
+
+
+class CaptureFormatError(ValueError):
+    pass
+
+
+class Captura:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise CaptureFormatError(f"{path}: archivo truncado")
+        magic, version, record_size, n, data_offset, index_offset, stride = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise CaptureFormatError(f"{path}: no es una captura .scap v{VERSION}")
+        if os.path.getsize(path) < index_offset + 8 * self._index_len(n, stride):
+            raise CaptureFormatError(f"{path}: archivo truncado")
+        self.stride = stride
+        if n:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=data_offset, shape=(n,))
+            self.index = np.memmap(path, dtype="<u8", mode="r", offset=index_offset,
+                                   shape=(self._index_len(n, stride),))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+            self.index = np.empty(0, dtype="<u8")
+
+    @staticmethod
+    def _index_len(n, stride):
+        return (n + stride - 1) // stride
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, column):
+        return self.records[column]
+
+    def timestamps_s(self):
+        return self.records["timestamp"] / 1000.0
+
+    def time_slice(self, t0_s, t1_s):
+        # Registros con t0 <= timestamp < t1: el índice disperso acota el tramo a
+        # leer y la búsqueda fina sólo toca ese tramo del memmap
+        t0, t1 = int(round(t0_s * 1000)), int(round(t1_s * 1000))
+        lo = max(0, int(np.searchsorted(self.index, t0, side="right")) - 1) * self.stride
+        hi = min(len(self), int(np.searchsorted(self.index, t1, side="right")) * self.stride)
+        ts = self.records["timestamp"][lo:hi]
+        start = lo + int(np.searchsorted(ts, t0, side="left"))
+        end = lo + int(np.searchsorted(ts, t1, side="left"))
+        return self.records[start:end]
+
+    def to_dataframe(self):
+        # Mismo layout que el CSV (timestamp en segundos, distancias en mm)
+        return pd.DataFrame({
+            "timestamp": self.timestamps_s(),
+            "side": self.records["side"].astype(float),
+            "top": self.records["top"].astype(float),
+            "bottom": self.records["bottom"].astype(float),
+        })
+
+
+def escribir_binario(records, path, stride=DEFAULT_STRIDE):
+    records = np.asarray(records, dtype=RECORD_DTYPE)
+    data_offset = HEADER.size
+    index_offset = data_offset + records.nbytes
+    index = records["timestamp"][::stride].astype("<u8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, len(records),
+                            data_offset, index_offset, stride))
+        f.write(records.tobytes())
+        f.write(index.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def registros_desde_dataframe(df):
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    records["timestamp"] = np.rint(df["timestamp"].to_numpy(dtype=float) * 1000)
+    for col in ("side", "top", "bottom"):
+        records[col] = np.rint(np.nan_to_num(df[col].to_numpy(dtype=float), nan=-1))
+    records.sort(order="timestamp", kind="stable")
+    return records
+
+
+def csv_a_binario(csv_path, out_path=None, stride=DEFAULT_STRIDE):
+    out_path = out_path or os.path.splitext(csv_path)[0] + CAPTURE_EXT
+    df = pd.read_csv(csv_path, usecols=COLUMNS)
+    return escribir_binario(registros_desde_dataframe(df), out_path, stride)
+
+
+def binario_a_csv(bin_path, out_path=None):
+    out_path = out_path or os.path.splitext(bin_path)[0] + ".csv"
+    cap = Captura(bin_path)
+    ts = cap["timestamp"]
+    df = pd.DataFrame({
+        "timestamp": [f"{t // 1000}.{t % 1000:03d}" for t in ts.tolist()],
+        "side": cap["side"], "top": cap["top"], "bottom": cap["bottom"],
+    })
+    df.to_csv(out_path, index=False)
+    return out_path
+
+
+def cargar_captura(path):
+    # DataFrame timestamp/side/top/bottom desde CSV o .scap, ordenado por tiempo
+    if path.endswith(CAPTURE_EXT):
+        return Captura(path).to_dataframe()
+    df = pd.read_csv(path, dtype={"timestamp": float, "side": float, "top": float, "bottom": float})
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # python capture_format.py captura.csv [...]  → captura.scap (y .scap → .csv)
+    for src in sys.argv[1:]:
+        dst = binario_a_csv(src) if src.endswith(CAPTURE_EXT) else csv_a_binario(src)
+        print(f"✅ {src} → {dst}")
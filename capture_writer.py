@@ -0,0 +1,134 @@
+import os
+import csv
+import time
+import queue
+import threading
+
+CAPTURE_HEADER = ["timestamp", "side", "top", "bottom"]
+
+
+def default_capture_path(tag=None):
+    suffix = f"_{tag}" if tag else ""
+    return f"esp32_data{suffix}_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+
+
+_SYNC = object()
+
+
+class CaptureWriter:
+    # === Escritura de capturas en un hilo dedicado ===
+    # Los productores (hilo BLE) sólo encolan lotes de filas; el disco se toca
+    # únicamente en este hilo. La cola es acotada y nunca se espera en ella: si el
+    # disco no da abasto, writerows/mark_block lanzan queue.Full al instante; el
+    # decodificador descarta esas tramas y el bloque queda sin ACK, así el ESP32
+    # lo reenvía (go-back-N) sin que el loop de asyncio se detenga.
+    # flush por tamaño (flush_rows) o por tiempo (flush_interval) y fsync en
+    # cada frontera de bloque; mark_block avisa (on_durable) cuando el bloque ya
+    # está en disco, y sólo entonces se confirma al ESP32.
+    def __init__(self, path, header=CAPTURE_HEADER, max_batches=256,
+                 flush_rows=500, flush_interval=0.5):
+        self.path = path
+        self.header = header
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self.syncs = 0
+        self.error = None
+        self._q = queue.Queue(maxsize=max_batches)
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        # True cuando el hilo terminó: archivo cerrado (o error en self.error)
+        return not self._thread.is_alive()
+
+    def _accepting(self):
+        return self.error is None and not self._closing.is_set() and self._thread.is_alive()
+
+    # Misma interfaz que csv.writer, para usarse como sink de BLEManager
+    def writerows(self, rows):
+        if rows and self._accepting():
+            self._q.put_nowait(list(rows))
+
+    def writerow(self, row):
+        self.writerows([row])
+
+    def mark_block(self, on_durable=None):
+        # on_durable() se llama desde el hilo escritor tras el fsync del bloque;
+        # si la escritura falla, nunca se llama
+        if self._accepting():
+            self._q.put_nowait((_SYNC, on_durable))
+
+    def close(self, wait=False, timeout=None):
+        # No encola nada: el hilo termina al vaciar la cola, así cerrar nunca
+        # espera por el disco salvo que se pida wait
+        self._closing.set()
+        try:
+            self._q.put_nowait(None)  # despierta al hilo si esperaba en la cola
+        except queue.Full:
+            pass
+        if wait:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            f = open(self.path, "w", newline="", encoding="utf-8")
+        except OSError as e:
+            self.error = e
+            self._drain()
+            return
+        try:
+            with f:
+                self._write_loop(f)
+        except Exception as e:
+            # Disco lleno, E/S, ...: el error queda a la vista del productor, que
+            # deja de encolar; lo pendiente se descarta sin confirmar
+            self.error = self.error or e
+            self._drain()
+
+    def _write_loop(self, f):
+        writer = csv.writer(f)
+        if self.header:
+            writer.writerow(self.header)
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closing.is_set():
+                    break
+                item = None
+            if isinstance(item, tuple):
+                self._sync(f)
+                pending = 0
+                last_flush = time.monotonic()
+                on_durable = item[1]
+                if on_durable is not None:
+                    on_durable()
+                continue
+            if item:
+                writer.writerows(item)
+                pending += len(item)
+                self.rows += len(item)
+            if pending and (pending >= self.flush_rows
+                            or time.monotonic() - last_flush >= self.flush_interval):
+                f.flush()
+                pending = 0
+                last_flush = time.monotonic()
+        self._sync(f)
+
+    def _sync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+        self.syncs += 1
+
+    def _drain(self):
+        # Sin archivo o tras un error: vaciar la cola (nadie vuelve a encolar)
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                return
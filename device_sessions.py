@@ -0,0 +1,128 @@
+import os
+import re
+import queue
+import asyncio
+import threading
+
+from bleak import BleakScanner
+
+from ble_manager import BLEManager
+from capture_writer import CaptureWriter, default_capture_path
+
+# === Varias placas a la vez ===
+# Un solo hilo de asyncio y una sola pasada de descubrimiento para todas las
+# direcciones; luego conexión y FETCH concurrentes (asyncio.gather), así el
+# tiempo total lo marca el dispositivo más lento y no la suma de todos.
+
+
+class DeviceSession:
+    def __init__(self, address, loop, client_factory=None, window=8):
+        self.address = address
+        self.msg_q = queue.Queue()
+        self.ble = BLEManager(self.msg_q, client_factory=client_factory, window=window,
+                              address=address, loop=loop)
+        self.status = "pendiente"
+        self.capture = None
+        self.decoder = None
+
+    def tag(self):
+        return re.sub(r"[^0-9A-Za-z]", "", self.address)[-8:]
+
+    def describe(self):
+        line = f"{self.address}: {self.status}"
+        if self.capture:
+            line += f" → {self.capture.path} ({self.capture.rows} muestras)"
+        return line
+
+
+class SessionManager:
+    def __init__(self, addresses, client_factory=None, window=8, scan_timeout=5.0):
+        self.client_factory = client_factory
+        self.scan_timeout = scan_timeout
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run_loop, daemon=True).start()
+        self.sessions = [DeviceSession(a, self.loop, client_factory, window) for a in addresses]
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _discover(self):
+        # Una sola pasada; termina antes si ya aparecieron todas las direcciones
+        if self.client_factory:
+            return {s.address.upper(): None for s in self.sessions}
+        wanted = {s.address.upper() for s in self.sessions}
+        found = {}
+        all_found = asyncio.Event()
+
+        def on_detect(device, adv):
+            addr = device.address.upper()
+            if addr in wanted and addr not in found:
+                found[addr] = device
+                if len(found) == len(wanted):
+                    all_found.set()
+
+        async with BleakScanner(detection_callback=on_detect):
+            try:
+                await asyncio.wait_for(all_found.wait(), self.scan_timeout)
+            except asyncio.TimeoutError:
+                pass
+        return found
+
+    async def _connect_one(self, session, found):
+        addr = session.address.upper()
+        if addr not in found:
+            session.status = "no encontrado"
+            return False
+        session.status = "conectando"
+        ok = await session.ble._connect(found[addr])
+        session.status = "conectado" if ok else "error de conexión"
+        return ok
+
+    async def _connect_all(self):
+        for s in self.sessions:
+            s.status = "buscando"
+        found = await self._discover()
+        return await asyncio.gather(*(self._connect_one(s, found) for s in self.sessions))
+
+    def connect_all(self, timeout=None):
+        return self._run(self._connect_all(), timeout)
+
+    async def _fetch_one(self, session, out_dir, binary, timeout):
+        if not session.ble.is_connected():
+            return False
+        session.capture = CaptureWriter(os.path.join(out_dir, default_capture_path(session.tag())))
+        session.status = "descargando"
+        session.decoder = await session.ble.fetch_async(session.capture, binary=binary, timeout=timeout)
+        session.capture.close()
+        session.status = "completo" if session.decoder else "timeout"
+        return session.decoder is not None
+
+    async def _fetch_all(self, out_dir, binary, timeout):
+        return await asyncio.gather(*(self._fetch_one(s, out_dir, binary, timeout) for s in self.sessions))
+
+    def fetch_all(self, out_dir=".", binary=False, timeout=15.0):
+        results = self._run(self._fetch_all(out_dir, binary, timeout))
+        # El cierre de cada CaptureWriter (fsync final) se espera fuera del loop
+        for s in self.sessions:
+            if s.capture:
+                s.capture.close(wait=True, timeout=timeout)
+                if s.capture.error:
+                    s.status = f"error de escritura: {s.capture.error}"
+        return results
+
+    async def _send_all(self, cmd):
+        return await asyncio.gather(*(s.ble._send(cmd) for s in self.sessions if s.ble.is_connected()))
+
+    def send_all(self, cmd, timeout=None):
+        return self._run(self._send_all(cmd), timeout)
+
+    async def _close_all(self):
+        await asyncio.gather(*(s.ble.client.disconnect() for s in self.sessions if s.ble.client),
+                             return_exceptions=True)
+
+    def close(self, timeout=None):
+        self._run(self._close_all(), timeout)
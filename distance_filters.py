@@ -0,0 +1,213 @@
+import math
+from bisect import insort, bisect_left
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# === Filtro de lecturas del VL53L1X ===
+# Tres etapas por canal (side / top / bottom):
+#   1. dropout: -1 (sin lectura), 0, NaN o fuera de rango → descartada
+#   2. Hampel: se rechaza la lectura si se aleja de la mediana de la ventana más de
+#      n_sigmas · 1.4826 · MAD
+#   3. Kalman de velocidad constante (opcional) para suavizar lo que sobrevive
+# Las lecturas rechazadas salen como NaN, así cualquier promedio posterior las ignora.
+# Modo en línea (ChannelFilter.update, coste fijo por muestra, ventana causal) para
+# la ingesta, y modo en lote sobre arrays (filtrar_canal) con ventana centrada.
+CHANNELS = ("side", "top", "bottom")
+MAX_RANGE_MM = 4000  # alcance del VL53L1X en modo largo
+MAD_SCALE = 1.4826
+# Tolerancia mínima del Hampel: con lecturas enteras casi repetidas la MAD cae a 0–1 mm,
+# por debajo del jitter del VL53L1X (±2–3 mm); en las mesetas de first_test.csv hay
+# saltos de hasta 6 mm respecto a la mediana que son ruido, no atípicos
+MIN_TOLERANCE_MM = 6.0
+
+
+def mascara_dropout(values, max_range=MAX_RANGE_MM):
+    # True donde la lectura es válida
+    values = np.asarray(values, dtype=float)
+    return (values > 0) & (values <= max_range)
+
+
+class ConstantVelocityKalman:
+    # Estado [distancia, velocidad]; q = ruido de aceleración (mm/s²)², r = varianza de la medida (mm²)
+    def __init__(self, q=500.0, r=25.0):
+        self.q = q
+        self.r = r
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.P = None
+        self.t = None
+
+    def update(self, t, z):
+        if self.x is None:
+            self.x = np.array([z, 0.0])
+            self.P = np.diag([self.r, 1e4])
+            self.t = t
+            return z
+        dt = max(t - self.t, 1e-3)
+        self.t = t
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        Q = self.q * np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]])
+        x = F @ self.x
+        P = F @ self.P @ F.T + Q
+        if math.isnan(z):
+            self.x, self.P = x, P
+            return x[0]
+        s = P[0, 0] + self.r
+        k = P[:, 0] / s
+        self.x = x + k * (z - x[0])
+        self.P = P - np.outer(k, P[0])
+        return self.x[0]
+
+
+class ChannelFilter:
+    # Filtro en línea de un canal: ventana causal de las últimas `window` lecturas válidas
+    def __init__(self, window=11, n_sigmas=3.5, max_range=MAX_RANGE_MM, kalman=False, q=500.0, r=25.0,
+                 min_tolerance=MIN_TOLERANCE_MM):
+        self.window = window
+        self.n_sigmas = n_sigmas
+        self.max_range = max_range
+        self.min_tolerance = min_tolerance
+        self.kalman = ConstantVelocityKalman(q, r) if kalman else None
+        self.reset()
+
+    def reset(self):
+        self._fifo = deque()
+        self._sorted = []
+        self.dropouts = 0
+        self.outliers = 0
+        if self.kalman:
+            self.kalman.reset()
+
+    def _median(self, values):
+        n = len(values)
+        mid = n // 2
+        return values[mid] if n % 2 else 0.5 * (values[mid - 1] + values[mid])
+
+    def _push(self, value):
+        self._fifo.append(value)
+        insort(self._sorted, value)
+        if len(self._fifo) > self.window:
+            old = self._fifo.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+
+    def update(self, t, value):
+        # t en segundos (sólo lo usa el Kalman); devuelve la lectura filtrada o NaN
+        value = float(value)
+        if not (0 < value <= self.max_range):
+            self.dropouts += 1
+            return self._rechazar(t)
+        accepted = True
+        if len(self._fifo) >= 3:
+            med = self._median(self._sorted)
+            mad = self._median(sorted(abs(v - med) for v in self._sorted))
+            accepted = abs(value - med) <= max(self.n_sigmas * MAD_SCALE * mad, self.min_tolerance)
+        # Las lecturas rechazadas también entran en la ventana: si el salto es real
+        # (cambio de pared), tras media ventana la mediana lo sigue
+        self._push(value)
+        if not accepted:
+            self.outliers += 1
+            return self._rechazar(t)
+        return self.kalman.update(t, value) if self.kalman else value
+
+    def _rechazar(self, t):
+        # Como filtrar_canal: el Kalman avanza su predicción por el hueco, pero la
+        # muestra rechazada sale como NaN (nunca la predicción)
+        if self.kalman and self.kalman.x is not None:
+            self.kalman.update(t, math.nan)
+        return math.nan
+
+
+class CaptureFilter:
+    # Un ChannelFilter por sensor; filas (timestamp, side, top, bottom)
+    def __init__(self, **kwargs):
+        self.channels = {c: ChannelFilter(**kwargs) for c in CHANNELS}
+
+    def update(self, t, side, top, bottom):
+        return tuple(self.channels[c].update(t, v) for c, v in zip(CHANNELS, (side, top, bottom)))
+
+    def reset(self):
+        for f in self.channels.values():
+            f.reset()
+
+    def describe(self):
+        parts = [f"{c}: {f.dropouts} sin lectura / {f.outliers} atípicas" for c, f in self.channels.items()]
+        return "🧹 " + " | ".join(parts)
+
+
+class FilteringSink:
+    # Sink de BLEManager que filtra antes de escribir. Mantiene el formato del CSV:
+    # las lecturas rechazadas se escriben como -1, igual que un dropout del sensor
+    def __init__(self, sink, **kwargs):
+        self.sink = sink
+        self.filter = CaptureFilter(**kwargs)
+
+    def writerows(self, rows):
+        out = []
+        for ts, side, top, bottom in rows:
+            vals = self.filter.update(float(ts), side, top, bottom)
+            out.append((ts, *(-1 if math.isnan(v) else int(round(v)) for v in vals)))
+        self.sink.writerows(out)
+
+    def mark_block(self, on_durable=None):
+        if hasattr(self.sink, "mark_block"):
+            self.sink.mark_block(on_durable)
+        elif on_durable is not None:
+            on_durable()
+
+    def __getattr__(self, name):
+        # rows, path, error, close()… del sink envuelto
+        return getattr(self.sink, name)
+
+
+def _mediana_filas(win, valid):
+    # Mediana por fila ignorando NaN: np.sort deja los NaN al final, así la mediana
+    # está en las posiciones centrales de las `valid` primeras (más rápido que nanmedian)
+    srt = np.sort(win, axis=1)
+    lo = np.maximum((valid - 1) // 2, 0)[:, None]
+    hi = np.maximum(valid // 2, 0)[:, None]
+    med = 0.5 * (np.take_along_axis(srt, lo, 1) + np.take_along_axis(srt, hi, 1))[:, 0]
+    med[valid == 0] = np.nan
+    return med
+
+
+def filtrar_canal(values, timestamps=None, window=11, n_sigmas=3.5, max_range=MAX_RANGE_MM,
+                  kalman=False, q=500.0, r=25.0, min_tolerance=MIN_TOLERANCE_MM):
+    # Versión en lote: ventana centrada de `window` muestras (sólo válidas cuentan)
+    values = np.asarray(values, dtype=float)
+    out = np.where(mascara_dropout(values, max_range), values, np.nan)
+    if len(out) >= 3:
+        half = window // 2
+        padded = np.pad(out, half, constant_values=np.nan)
+        win = sliding_window_view(padded, 2 * half + 1)
+        valid = np.sum(~np.isnan(win), axis=1)
+        enough = valid >= 3
+        med = _mediana_filas(win, valid)
+        mad = _mediana_filas(np.abs(win - med[:, None]), valid)
+        dev = np.abs(out - med)
+        limit = np.maximum(n_sigmas * MAD_SCALE * mad, min_tolerance)
+        out[enough & (dev > limit)] = np.nan
+    if kalman:
+        t = np.arange(len(out), dtype=float) if timestamps is None else np.asarray(timestamps, dtype=float)
+        kf = ConstantVelocityKalman(q, r)
+        smoothed = np.full(len(out), np.nan)
+        for i, z in enumerate(out):
+            if not math.isnan(z) or kf.x is not None:
+                smoothed[i] = kf.update(t[i], z)
+        # Sólo se suaviza donde hay lectura; los huecos siguen en NaN
+        out = np.where(np.isnan(out), np.nan, smoothed)
+    return out
+
+
+def filtrar_dataframe(df, **kwargs):
+    # Copia del DataFrame de una captura con side/top/bottom filtrados (NaN = rechazada)
+    df = df.copy()
+    ts = df["timestamp"].to_numpy(dtype=float) if "timestamp" in df else None
+    for c in CHANNELS:
+        if c in df:
+            df[c] = filtrar_canal(df[c].to_numpy(dtype=float), ts, **kwargs)
+    return df
+
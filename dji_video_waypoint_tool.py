@@ -1,10 +1,13 @@
 import cv2
 import os
-import re
 import csv
 from math import cos, radians
 from tkinter import Tk, filedialog
 
+from frame_access import FrameAccess
+from srt_index import abrir_telemetria
+from video_player import VideoPlayer
+
 # === Seleccionar archivo de video ===
 Tk().withdraw()  # Oculta ventana principal de Tkinter
 video_path = filedialog.askopenfilename(title="Selecciona un video MP4", filetypes=[("Archivos MP4", "*.mp4")])
@@ -15,63 +18,6 @@ if not video_path:
 base = os.path.splitext(video_path)[0]
 srt_path = base + '.srt'
 
-
-def parse_srt_by_frame(path):
-    pos_data = {}
-    current_frame = None
-    lat = lon = alt = None
-    gb_yaw = gb_pitch = gb_roll = None
-
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        for i, line in enumerate(f):
-            line = line.strip()
-
-            if "FrameCnt:" in line:
-                match = re.search(r"FrameCnt: (\d+)", line)
-                if match:
-                    current_frame = int(match.group(1)) - 1
-
-            if "[latitude:" in line:
-                match = re.search(r"\[latitude: ([\-\d\.]+)\]", line)
-                if match:
-                    lat = float(match.group(1))
-
-            if "[longitude:" in line:
-                match = re.search(r"\[longitude: ([\-\d\.]+)\]", line)
-                if match:
-                    lon = float(match.group(1))
-
-            if "[rel_alt:" in line:
-                match = re.search(r"\[rel_alt: ([\-\d\.]+)", line)
-                if match:
-                    alt = float(match.group(1))
-
-            # Extraer orientación del gimbal
-            if "[gb_yaw:" in line:
-                yaw_match   = re.search(r"\[gb_yaw:\s*([\-\d\.]+)", line)
-                pitch_match = re.search(r"gb_pitch:\s*([\-\d\.]+)", line)
-                roll_match  = re.search(r"gb_roll:\s*([\-\d\.]+)", line)
-                if yaw_match:   gb_yaw   = float(yaw_match.group(1))
-                if pitch_match: gb_pitch = float(pitch_match.group(1))
-                if roll_match:  gb_roll  = float(roll_match.group(1))
-
-            if "</font>" in line:
-                if current_frame is not None:
-                    pos_data[current_frame] = {
-                        "lat": lat,
-                        "lon": lon,
-                        "alt": alt,
-                        "gb_yaw": gb_yaw,
-                        "gb_pitch": gb_pitch,
-                        "gb_roll": gb_roll
-                    }
-                # Reset
-                current_frame = lat = lon = alt = gb_yaw = gb_pitch = gb_roll = None
-
-    print(f"✅ Frames con datos cargados: {len(pos_data)}")
-    return pos_data
-
-
 # === Conversión de coordenadas GPS a sistema local ===
 def gps_to_local_coords(lat0, lon0, lat, lon, alt, scale=111320):
     x = (lon - lon0) * scale * cos(radians(lat0))
@@ -80,13 +26,13 @@ def gps_to_local_coords(lat0, lon0, lat, lon, alt, scale=111320):
     return (x, y, z)
 
 # === Cargar datos GPS ===
-drone_data = parse_srt_by_frame(srt_path) if os.path.exists(srt_path) else {}
+drone_data = abrir_telemetria(srt_path) if os.path.exists(srt_path) else {}
 waypoints = []
 
 # === Abrir video ===
-cap = cv2.VideoCapture(video_path)
-fps = cap.get(cv2.CAP_PROP_FPS)
-total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+video = FrameAccess(video_path)
+player = VideoPlayer(video)
+total_frames = video.total_frames
 frame_index = 0
 paused = True
 
@@ -98,12 +44,18 @@ commands_text = [
     "[Q] Salir"
 ]
 
-while cap.isOpened():
-    
-    ret, frame = cap.read()
-    if not ret:
+while True:
+    if paused:
+        frame = video.read(frame_index)
+    else:
+        # reproducción: el hilo del player ya decodificó este frame
+        item = player.next()
+        if item is None:
+            break
+        frame_index, frame = item
+    if frame is None:
         break
-    frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    frame = frame.copy()  # el de la caché es de sólo lectura
     pos_data = drone_data.get(frame_index)
     if pos_data:
         lat = pos_data["lat"]
@@ -128,7 +80,7 @@ while cap.isOpened():
 
     cv2.imshow("Video", frame)
 
-    key = cv2.waitKey(0 if paused else int(1000 / fps)) & 0xFF
+    key = cv2.waitKey(0 if paused else player.wait_ms()) & 0xFF
 
     if key == ord('q'):
         break
@@ -136,16 +88,14 @@ while cap.isOpened():
         paused = not paused
     elif key == ord('d'):
         paused = True
-        frame_index = min(frame_index + 1, total_frames - 1)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        frame_index = min(frame_index + 1, len(video) - 1)
     elif key == ord('a'):
         paused = True
         frame_index = max(frame_index - 1, 0)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
     elif key == ord('w'):
         gps = drone_data.get(frame_index)
         if gps:
-            waypoints.append((frame_index, *gps))
+            waypoints.append((frame_index, gps["lat"], gps["lon"], gps["alt"]))
             print(f"✅ Waypoint guardado: frame {frame_index} → {gps}")
             cv2.putText(frame, "✅ Waypoint guardado", (10, frame.shape[0] - 20),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
@@ -157,8 +107,13 @@ while cap.isOpened():
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
             cv2.imshow("Video", frame)
             cv2.waitKey(1000)
+    if paused and player.running:
+        player.stop()
+    elif not paused and not player.running:
+        player.start(frame_index + 1)
 
-cap.release()
+player.stop()
+video.close()
 cv2.destroyAllWindows()
 
 # === Exportar waypoints ===
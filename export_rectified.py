@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+
+import cv2
+import numpy as np
+
+from calibration import cargar_perfil
+from rectification import DEFAULT_STEP_DEG, RectificationEngine
+from srt_telemetry import parse_srt_by_frame
+from telemetry_fusion import MODES, cargar_distancias, fusionar
+from temporal_join import TemporalJoin
+
+# === Exportación del video completo corregido ===
+# Tres etapas en hilos unidos por colas acotadas:
+#   decodificar (cap.read) → corregir (normal de cámara de la tabla fusionada,
+#   mapas de remap en caché) → codificar (cv2.VideoWriter, hilo principal).
+# Las tres trabajan a la vez (OpenCV suelta el GIL) y una cola llena frena a la
+# etapa anterior, así la memoria no crece con la longitud del video.
+DEFAULT_QUEUE = 8
+FOURCC = "mp4v"
+_END = object()
+
+
+class _Stage(threading.Thread):
+    # Hilo que recorre su fuente y deja cada resultado en `out`; si falla, el error
+    # queda en self.error y se avisa al resto con `stop`
+    def __init__(self, name, produce, out, stop):
+        super().__init__(name=name, daemon=True)
+        self.produce = produce
+        self.out = out
+        self.stop = stop
+        self.error = None
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            for item in self.produce():
+                if not self.put(item):
+                    return
+        except Exception as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            self.put(_END)
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def exportar_video(video_path, normals, output, queue_size=DEFAULT_QUEUE, fourcc=FOURCC,
+                   step_deg=DEFAULT_STEP_DEG, sin_normal="last", first=0, last=None, progress=True):
+    # normals: (N, 3) normal de cámara por frame (NaN = sin datos). sin_normal decide
+    # qué hacer en esos frames: "last" reutiliza la última válida, "raw" deja el frame
+    # tal cual. Devuelve (frames escritos, frames sin corregir)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise OSError(f"no se pudo abrir el video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    last = total - 1 if last is None else min(last, total - 1)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    root, ext = os.path.splitext(output)
+    tmp = f"{root}.tmp{ext}"
+    writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*fourcc), fps, (W, H))
+    if not writer.isOpened():
+        cap.release()
+        raise OSError(f"no se pudo crear el video: {output}")
+
+    engine = RectificationEngine(step_deg=step_deg)
+    stop = threading.Event()
+    decoded = queue.Queue(maxsize=queue_size)
+    rectified = queue.Queue(maxsize=queue_size)
+    raw_frames = 0
+
+    def decodificar():
+        for i in range(first, last + 1):
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield i, frame
+
+    def corregir():
+        nonlocal raw_frames
+        normal_ok = None
+        while True:
+            item = _get(decoded, stop)
+            if item is _END:
+                return
+            i, frame = item
+            normal = normals[i] if i < len(normals) else None
+            if normal is not None and np.all(np.isfinite(normal)):
+                normal_ok = normal
+            elif sin_normal == "last":
+                normal = normal_ok
+            else:
+                normal = None
+            if normal is None:
+                raw_frames += 1
+                yield i, frame
+            else:
+                yield i, engine.rectificar(frame, normal)
+
+    stages = [_Stage("decode", decodificar, decoded, stop), _Stage("rectify", corregir, rectified, stop)]
+    for stage in stages:
+        stage.start()
+
+    written = 0
+    n = last - first + 1
+    t0 = t_report = time.perf_counter()
+    ok = False
+    try:
+        try:
+            while True:
+                item = _get(rectified, stop)
+                if item is _END:
+                    break
+                writer.write(item[1])
+                written += 1
+                now = time.perf_counter()
+                if progress and (now - t_report >= 1.0 or written == n):
+                    t_report = now
+                    print(f"\r🎞️ {written}/{n} frames  {written / (now - t0):.1f} fps  "
+                          f"(colas: {decoded.qsize()}/{rectified.qsize()})", end="", flush=True)
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.join(timeout=5)
+            cap.release()
+            writer.release()
+            if progress:
+                print()
+        errors = [s.error for s in stages if s.error is not None]
+        if errors:
+            raise errors[0]
+        os.replace(tmp, output)
+        ok = True
+    finally:
+        # Cualquier fallo (etapas, write/release en este hilo, Ctrl+C) borra el
+        # temporal; sólo un video completo sustituye a `output`
+        if not ok and os.path.exists(tmp):
+            os.remove(tmp)
+    return written, raw_frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el video completo con corrección de perspectiva")
+    parser.add_argument("video", help="video MP4")
+    parser.add_argument("capture", help="captura de distancias (.csv o .scap)")
+    parser.add_argument("--srt", help="subtítulos .SRT (por defecto <video>.srt)")
+    parser.add_argument("-o", "--output", help="video de salida (por defecto <video>_rectified.mp4)")
+    parser.add_argument("--mode", choices=MODES, default="linear", help="interpolación de distancias")
+    parser.add_argument("--calibration", help="perfil de calibración JSON")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP_DEG,
+                        help="cuantización de la normal en grados (0 = exacta)")
+    parser.add_argument("--missing", choices=["last", "raw"], default="last",
+                        help="frames sin normal: última normal válida o sin corregir")
+    parser.add_argument("--start", type=int, default=0, help="primer frame")
+    parser.add_argument("--end", type=int, default=None, help="último frame (inclusive)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE, help="frames en cada cola entre etapas")
+    parser.add_argument("--fourcc", default=FOURCC)
+    args = parser.parse_args(argv)
+
+    base = os.path.splitext(args.video)[0]
+    output = args.output or base + "_rectified.mp4"
+    try:
+        join = TemporalJoin.from_dataframe(cargar_distancias(args.capture))
+        fused = fusionar(parse_srt_by_frame(args.srt or base + ".srt"), join, mode=args.mode,
+                         perfil=cargar_perfil(args.calibration))
+        normals = np.column_stack([fused.cam_normal_x, fused.cam_normal_y, fused.cam_normal_z])
+        t0 = time.perf_counter()
+        written, raw = exportar_video(args.video, normals, output, queue_size=args.queue, fourcc=args.fourcc,
+                                      step_deg=args.step, sin_normal=args.missing, first=args.start, last=args.end)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"✅ {written} frames ({raw} sin corregir) en {time.perf_counter() - t0:.1f} s → {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+import csv
+import time
+import random
+import asyncio
+
+from ble_manager import CHAR_UUID, ESP32_ADDR
+from ble_protocol import LIVE_MAGIC, encode_frame, records_per_frame, reloj_esp32_ms
+
+# === Periférico ESP32 simulado ===
+# Reproduce la máquina de estados de Lab3.ino (FETCH / FETCH_BIN, ventana de ACK
+# con go-back-N, WAIT_ACK, END, GET_MEM) con la interfaz de BleakClient que usa
+# BLEManager, para probar y medir el host sin hardware (ver ingest_loadtest.py).
+BLOCK_SIZE = 10
+BIN_FRAMES_PER_BLOCK = 8
+ACK_TIMEOUT_S = 5.0
+RETX_TIMEOUT_S = 1.0
+MAX_RETRIES = 5
+FINAL_ACK = 9999
+
+
+def sintetizar_muestras(n, t0_ms=1747678671148, periodo_ms=500):
+    return [(t0_ms + i * periodo_ms, 2665 + i % 7, 1885 - i % 5, 551 + i % 3) for i in range(n)]
+
+
+def cargar_muestras_csv(path):
+    # Captura existente (timestamp,side,top,bottom) → registros SensorData
+    samples = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            samples.append((int(round(float(row["timestamp"]) * 1000)), int(float(row["side"])),
+                            int(float(row["top"])), int(float(row["bottom"]))))
+    return samples
+
+
+class FakeESP32Client:
+    def __init__(self, address=ESP32_ADDR, samples=None, mtu_size=247,
+                 text_delay=0.0, bin_delay=0.0, latency=0.0, loss=0.0,
+                 free_heap=180000, seed=0, live_hz=10, live_speed=None):
+        self.address = address
+        self.samples = samples if samples is not None else sintetizar_muestras(4000)
+        self.mtu_size = mtu_size
+        self.text_delay = text_delay
+        self.bin_delay = bin_delay
+        # latency: retardo de cada escritura del host; loss: probabilidad de perder
+        # una notificación de datos (para ejercitar los reenvíos)
+        self.latency = latency
+        self.loss = loss
+        self.free_heap = free_heap
+        self.window = 1
+        # live_speed: reproducir el modo en vivo con el ritmo real de la captura
+        # (1.0 = tiempo real, 10.0 = diez veces más rápido); si es None, live_hz fijo
+        self.live_hz = live_hz
+        self.live_speed = live_speed
+        # Último instante (perf_counter) en que se emitió cada muestra, para medir latencias
+        self.sent_at = [0.0] * len(self.samples)
+        self._live_task = None
+        self.retransmissions = 0
+        self._rng = random.Random(seed)
+        self.is_connected = False
+        self.notifications = 0
+        self._callback = None
+        self._task = None
+        self._last_ack = -1
+        self._ack_event = None
+
+    async def connect(self):
+        self.is_connected = True
+        self._ack_event = asyncio.Event()
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        for task in (self._task, self._live_task):
+            if task:
+                task.cancel()
+        return True
+
+    async def start_notify(self, uuid, callback):
+        self._callback = callback
+
+    async def write_gatt_char(self, uuid, data, response=True):
+        msg = bytes(data).decode("utf-8")
+        if response:
+            await asyncio.sleep(self.latency)
+            self._on_write(msg)
+        else:
+            asyncio.get_running_loop().call_later(self.latency, self._on_write, msg)
+
+    def _on_write(self, msg):
+        if msg == "FETCH" or msg.startswith("FETCH_BIN"):
+            payload = int(msg.split(":", 1)[1]) if ":" in msg else 20
+            binary = msg.startswith("FETCH_BIN")
+            if self._task:
+                self._task.cancel()
+            self._last_ack = -1
+            self._task = asyncio.get_running_loop().create_task(self._send_all(binary, payload))
+        elif msg.startswith("ACK:BLOCK_"):
+            self._last_ack = max(self._last_ack, int(msg[len("ACK:BLOCK_"):]))
+            self._ack_event.set()
+        elif msg.startswith("WINDOW:"):
+            self.window = max(1, min(int(msg[len("WINDOW:"):]), 32))
+        elif msg.startswith("LIVE:"):
+            if self._live_task:
+                self._live_task.cancel()
+                self._live_task = None
+            if msg != "LIVE:0":
+                self._live_task = asyncio.get_running_loop().create_task(self._stream_live())
+        elif msg == "GET_MEM":
+            self._notify(f"FREE_HEAP:{self.free_heap}".encode())
+        elif msg == "RESET":
+            if self._task:
+                self._task.cancel()
+
+    def _notify(self, payload):
+        self.notifications += 1
+        if self._callback:
+            self._callback(CHAR_UUID, bytearray(payload))
+
+    def _notify_data(self, payload):
+        if self.loss and self._rng.random() < self.loss:
+            self.notifications += 1
+            return
+        self._notify(payload)
+
+    def _stamp(self, start, end):
+        now = time.perf_counter()
+        for i in range(start, end):
+            self.sent_at[i] = now
+
+    async def _stream_live(self):
+        # Como loop() con LIVE:1: cada muestra sale al tomarla, con la hora local del
+        # reloj sincronizado por SYNC (no UTC)
+        prev_ts = None
+        for i, (rec_ts, d1, d2, d3) in enumerate(self.samples):
+            if self.live_speed and prev_ts is not None:
+                await asyncio.sleep(max(0, rec_ts - prev_ts) / 1000.0 / self.live_speed)
+            elif prev_ts is not None:
+                await asyncio.sleep(1.0 / self.live_hz)
+            prev_ts = rec_ts
+            self._stamp(i, i + 1)
+            self._notify(encode_frame(i, [(int(reloj_esp32_ms()), d1, d2, d3)], LIVE_MAGIC))
+
+    async def _wait_ack(self, block, timeout):
+        self._ack_event.clear()
+        try:
+            await asyncio.wait_for(self._ack_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._last_ack >= block
+
+    async def _send_block(self, block, start, end, binary, per_frame):
+        if binary:
+            for i in range(start, end, per_frame):
+                stop = min(i + per_frame, end)
+                self._stamp(i, stop)
+                self._notify_data(encode_frame(i, self.samples[i:stop]))
+                await asyncio.sleep(self.bin_delay)
+        else:
+            for i in range(start, end):
+                ts, d1, d2, d3 = self.samples[i]
+                self._stamp(i, i + 1)
+                self._notify_data(f"{i},{ts // 1000}.{ts % 1000:03d},{d1},{d2},{d3}".encode())
+                await asyncio.sleep(self.text_delay)
+        self._notify(f"WAIT_ACK:{block}:{end}".encode())
+
+    async def _send_all(self, binary, payload):
+        per_frame = records_per_frame(payload)
+        block_len = per_frame * BIN_FRAMES_PER_BLOCK if binary else BLOCK_SIZE
+        n = len(self.samples)
+        blocks = [(start, min(start + block_len, n)) for start in range(0, n, block_len)]
+
+        # Misma lógica que SENDING_BLOCK en el firmware
+        next_block, progress, retries = 0, -1, 0
+        last_progress = time.monotonic()
+        while self._last_ack < len(blocks) - 1:
+            if self._last_ack != progress:
+                progress, retries = self._last_ack, 0
+                last_progress = time.monotonic()
+            if next_block < len(blocks) and next_block <= self._last_ack + self.window:
+                await self._send_block(next_block, *blocks[next_block], binary, per_frame)
+                next_block += 1
+                continue
+            remaining = RETX_TIMEOUT_S - (time.monotonic() - last_progress)
+            if remaining > 0 and await self._wait_ack(progress + 1, remaining):
+                continue
+            if time.monotonic() - last_progress < RETX_TIMEOUT_S:
+                continue
+            retries += 1
+            if retries > MAX_RETRIES:
+                return
+            next_block = self._last_ack + 1
+            self.retransmissions += 1
+            last_progress = time.monotonic()
+        self._notify(b"END")
+        await self._wait_ack(FINAL_ACK, ACK_TIMEOUT_S)
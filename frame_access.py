@@ -0,0 +1,193 @@
+import shutil
+import threading
+import subprocess
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# === Acceso aleatorio a frames de video ===
+# cap.set(CAP_PROP_POS_FRAMES, n) en H.264/H.265 vuelve al keyframe anterior y
+# decodifica hasta n, descartando todo lo intermedio: cada [A] en un 4K de DJI
+# cuesta cientos de ms. Aquí el decodificador se lleva a mano:
+#   - índice de keyframes (ffprobe si está instalado; si no, uno por segundo) para
+#     saltar al keyframe justo y seguir leyendo hacia delante sin volver a buscar;
+#   - los frames decodificados cerca del cursor se guardan en un LRU con tope de
+#     memoria, así retroceder dentro del GOP ya recorrido no decodifica nada;
+#   - un hilo rellena en segundo plano los vecinos (delante y detrás) que falten.
+# Los índices son 0-based: el frame n es el que devuelve la (n+1)-ésima lectura,
+# la misma convención que las claves del SRT (FrameCnt - 1).
+DEFAULT_MAX_MB = 512
+DEFAULT_AHEAD = 8
+DEFAULT_BEHIND = 8
+
+
+def _keyframes_ffprobe(video_path):
+    # Paquetes del stream de video (sin decodificar): pts y flags ("K" = keyframe).
+    # El índice de frame es la posición del pts en orden de presentación
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts,flags", "-of", "csv=p=0", video_path]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    pts, key = [], []
+    for line in out.splitlines():
+        fields = line.split(",")
+        if len(fields) < 2 or not fields[0].lstrip("-").isdigit():
+            continue
+        pts.append(int(fields[0]))
+        key.append("K" in fields[1])
+    order = np.argsort(np.asarray(pts), kind="stable")
+    return np.flatnonzero(np.asarray(key, dtype=bool)[order])
+
+
+def indice_keyframes(video_path, total_frames, fps):
+    # Frames (0-based) donde empieza cada GOP. Sin ffprobe se estima un keyframe por
+    # segundo: si el video tiene GOPs más largos el acceso sigue siendo correcto
+    # (OpenCV busca el keyframe real), sólo se decodifica algo más
+    if shutil.which("ffprobe"):
+        try:
+            keyframes = _keyframes_ffprobe(video_path)
+            if len(keyframes) and keyframes[0] == 0:
+                return keyframes
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            pass
+    gop = max(1, int(round(fps or 30)))
+    return np.arange(0, max(total_frames, 1), gop)
+
+
+class FrameAccess:
+    def __init__(self, video_path, max_mb=DEFAULT_MAX_MB, ahead=DEFAULT_AHEAD, behind=DEFAULT_BEHIND,
+                 keyframes=None, prefetch=True):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise OSError(f"no se pudo abrir el video: {video_path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.keyframes = (np.asarray(keyframes, dtype=np.int64) if keyframes is not None
+                          else indice_keyframes(video_path, self.total_frames, self.fps))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ahead = ahead
+        self.behind = behind
+        self.hits = 0
+        self.misses = 0
+
+        self._frames = OrderedDict()  # frame → ndarray (sólo lectura), en orden de uso
+        self._bytes = 0
+        self._frame_bytes = None
+        self._pos = 0      # frame que devolverá la próxima cap.read()
+        self._cursor = 0
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        if prefetch:
+            self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+            self._thread.start()
+
+    def __len__(self):
+        return self.total_frames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def keyframe_antes(self, frame):
+        i = int(np.searchsorted(self.keyframes, frame, side="right")) - 1
+        return int(self.keyframes[i]) if i >= 0 else 0
+
+    def _ventana(self, center):
+        # Frames que merece la pena guardar alrededor del cursor, recortados para que
+        # quepan en el tope de memoria
+        ahead, behind = self.ahead, self.behind
+        if self._frame_bytes:
+            fit = max(self.max_bytes // self._frame_bytes - 1, 0)
+            ahead = min(ahead, fit - min(behind, fit // 2))
+            behind = min(behind, fit - ahead)
+        return center - behind, center + ahead
+
+    def _guardar(self, frame_index, frame):
+        lo, hi = self._ventana(self._cursor)
+        if frame_index in self._frames or not (lo <= frame_index <= hi or frame_index == self._cursor):
+            return
+        frame.flags.writeable = False
+        self._frame_bytes = self._frame_bytes or frame.nbytes
+        self._frames[frame_index] = frame
+        self._bytes += frame.nbytes
+        while self._bytes > self.max_bytes and len(self._frames) > 1:
+            # el más antiguo en uso, salvo el frame en pantalla
+            victim = next(k for k in self._frames if k != self._cursor)
+            self._bytes -= self._frames.pop(victim).nbytes
+
+    def _paso(self, target):
+        # Un paso del decodificador hacia target: saltar al keyframe o leer un frame.
+        # Devuelve True cuando target ya está disponible (o no existe)
+        if target in self._frames or target >= self.total_frames:
+            return True
+        if target < self._pos or self.keyframe_antes(target) > self._pos:
+            self._pos = self.keyframe_antes(target)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self._pos)
+            return False
+        ret, frame = self.cap.read()
+        if not ret:
+            # CAP_PROP_FRAME_COUNT es una estimación: el video termina aquí
+            self.total_frames = self._pos
+            return True
+        self._guardar(self._pos, frame)
+        self._pos += 1
+        return False
+
+    def read(self, frame_index):
+        # Frame decodificado (sólo lectura: copiar antes de dibujar encima) o None
+        if frame_index < 0 or frame_index >= self.total_frames:
+            return None
+        with self._lock:
+            self._cursor = frame_index
+            frame = self._frames.get(frame_index)
+            if frame is not None:
+                self.hits += 1
+                self._frames.move_to_end(frame_index)
+            else:
+                self.misses += 1
+                while not self._paso(frame_index):
+                    pass
+                frame = self._frames.get(frame_index)
+        self._wake.set()
+        return frame
+
+    def _objetivo(self):
+        # Primer vecino del cursor que falta: primero hacia delante, luego hacia atrás
+        lo, hi = self._ventana(self._cursor)
+        c = self._cursor
+        for j in list(range(c + 1, hi + 1)) + list(range(c - 1, lo - 1, -1)):
+            if 0 <= j < self.total_frames and j not in self._frames:
+                return j
+        return None
+
+    def _prefetch_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._closed and not self._wake.is_set():
+                # Un paso por vuelta: read() sólo espera, como mucho, una decodificación
+                with self._lock:
+                    if self._closed:
+                        return
+                    target = self._objetivo()
+                    if target is None:
+                        break
+                    self._paso(target)
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._frames), "mb": self._bytes / 1e6, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+            self.cap.release()
@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+import numpy as np
+
+# === Rotación dron → cámara según la actitud del gimbal ===
+# Misma convención que toolvideo.rotar_normal_a_sistema_camara:
+#   R = R_yaw(-yaw) @ R_pitch(-pitch) @ R_roll(-roll),  normal_cámara = R @ normal_dron
+# Versión en lote para todos los frames de un SRT: las matrices se apilan en un
+# array (N, 3, 3) y se aplican con un solo einsum. El gimbal reporta la actitud con
+# una décima de grado, así que muchas filas se repiten; sólo se calcula una matriz
+# por actitud distinta y se reutiliza para el resto.
+
+
+def _matrices(yaw_deg, pitch_deg, roll_deg):
+    # Arrays (U,) → (U, 3, 3)
+    yaw, pitch, roll = (-np.radians(np.asarray(a, dtype=float)) for a in (yaw_deg, pitch_deg, roll_deg))
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cr, sr = np.cos(roll), np.sin(roll)
+    zero, one = np.zeros_like(yaw), np.ones_like(yaw)
+
+    R_yaw = np.stack([cy, -sy, zero, sy, cy, zero, zero, zero, one], axis=-1).reshape(-1, 3, 3)
+    R_pitch = np.stack([cp, zero, sp, zero, one, zero, -sp, zero, cp], axis=-1).reshape(-1, 3, 3)
+    R_roll = np.stack([one, zero, zero, zero, cr, -sr, zero, sr, cr], axis=-1).reshape(-1, 3, 3)
+    return R_yaw @ R_pitch @ R_roll
+
+
+@lru_cache(maxsize=4096)
+def matriz_gimbal(yaw_deg, pitch_deg, roll_deg):
+    R = _matrices([yaw_deg], [pitch_deg], [roll_deg])[0]
+    R.flags.writeable = False
+    return R
+
+
+def matrices_gimbal(yaw_deg, pitch_deg, roll_deg):
+    # (N, 3, 3), una matriz por actitud distinta
+    att = np.column_stack(np.broadcast_arrays(np.asarray(yaw_deg, dtype=float),
+                                              np.asarray(pitch_deg, dtype=float),
+                                              np.asarray(roll_deg, dtype=float)))
+    if not len(att):
+        return np.empty((0, 3, 3))
+    unique, inverse = np.unique(att, axis=0, return_inverse=True)
+    return _matrices(*unique.T)[inverse.reshape(-1)]
+
+
+def pitch_yaw(normales):
+    normales = np.asarray(normales, dtype=float)
+    yaw = np.degrees(np.arctan2(normales[..., 0], -normales[..., 2]))
+    pitch = np.degrees(np.arctan2(normales[..., 1], -normales[..., 2]))
+    return pitch, yaw
+
+
+def rotar_normal_a_sistema_camara(normal_dron, yaw_deg, pitch_deg, roll_deg):
+    return matriz_gimbal(float(yaw_deg), float(pitch_deg), float(roll_deg)) @ np.asarray(normal_dron, dtype=float)
+
+
+def rotar_normales_a_camara(normales_dron, yaw_deg, pitch_deg, roll_deg):
+    # normales_dron (N, 3) o (3,) común a todos los frames; gimbal en arrays (N,)
+    # Devuelve normales en cámara (N, 3), pitch (N,) y yaw (N,) en grados.
+    # Frames sin gimbal o sin normal (NaN) quedan en NaN.
+    R = matrices_gimbal(yaw_deg, pitch_deg, roll_deg)
+    normales = np.broadcast_to(np.asarray(normales_dron, dtype=float), (len(R), 3))
+    normal_camara = np.einsum("nij,nj->ni", R, normales)
+    pitch_c, yaw_c = pitch_yaw(normal_camara)
+    return normal_camara, pitch_c, yaw_c
@@ -1,8 +1,16 @@
+import time
+
 import cv2
 import numpy as np
 from math import sin, cos, radians
 from tkinter import filedialog, Tk
 
+# Vista previa: mientras se arrastra un slider se renderiza sobre una copia reducida
+# de la imagen; cuando los sliders llevan SETTLE_S sin moverse, a resolución completa.
+# Sin cambios no se recalcula nada.
+PROXY_MAX_SIDE = 960
+SETTLE_S = 0.15
+
 Tk().withdraw()
 img_path = filedialog.askopenfilename(title="Selecciona una imagen", filetypes=[("Imagen", "*.jpg *.png *.jpeg")])
 if not img_path:
@@ -14,17 +22,15 @@ H, W = imagen.shape[:2]
 fx = fy = 1000
 cx, cy = W / 2, H / 2
 K = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]])
+K_inv = np.linalg.inv(K)
 
-def on_change(val): pass
+proxy_scale = min(1.0, PROXY_MAX_SIDE / max(W, H))
+proxy = cv2.resize(imagen, (int(W * proxy_scale), int(H * proxy_scale)), interpolation=cv2.INTER_AREA)
+corners = np.array([[0, 0], [W, 0], [W, H], [0, H]], dtype=np.float64)
 
-cv2.namedWindow("Homografía interactiva")
-cv2.createTrackbar("Yaw (-90° a +90°)", "Homografía interactiva", 90, 180, on_change)
-cv2.createTrackbar("Pitch (-90° a +90°)", "Homografía interactiva", 90, 180, on_change)
-
-while True:
-    yaw_deg = cv2.getTrackbarPos("Yaw (-90° a +90°)", "Homografía interactiva") - 90
-    pitch_deg = cv2.getTrackbarPos("Pitch (-90° a +90°)", "Homografía interactiva") - 90
+def on_change(val): pass
 
+def homografia(yaw_deg, pitch_deg):
     pitch = radians(pitch_deg)
     yaw = radians(yaw_deg)
 
@@ -40,30 +46,83 @@ while True:
     x_axis /= np.linalg.norm(x_axis)
     y_axis = np.cross(z_axis, x_axis)
     R = np.vstack([x_axis, y_axis, z_axis]).T
-    H_matrix = K @ R.T @ np.linalg.inv(K)
+    return K @ R.T @ K_inv
 
-    # Proyección en canvas grande
-    corregida_grande = cv2.warpPerspective(imagen, H_matrix, (int(W * 2), int(H * 2)))
+def caja_visible(H_matrix):
+    # Recorte del contenido en el lienzo 2W×2H a partir de las 4 esquinas proyectadas
+    # (intersección del cuadrilátero con el lienzo), sin barrer píxeles. None si
+    # alguna esquina cae detrás de la cámara (w ≤ 0)
+    pts = np.c_[corners, np.ones(4)] @ H_matrix.T
+    if np.any(pts[:, 2] <= 0):
+        return None
+    quad = (pts[:, :2] / pts[:, 2:]).astype(np.float32)
+    lienzo = np.array([[0, 0], [2 * W, 0], [2 * W, 2 * H], [0, 2 * H]], dtype=np.float32)
+    area, poly = cv2.intersectConvexConvex(quad, lienzo)
+    if area <= 0 or poly is None:
+        return None
+    poly = poly.reshape(-1, 2)
+    x, y = np.floor(poly.min(axis=0)).astype(int)
+    x1, y1 = np.ceil(poly.max(axis=0)).astype(int)
+    return int(x), int(y), int(x1 - x), int(y1 - y)
 
-    # Encontrar el contenido visible
-    gray = cv2.cvtColor(corregida_grande, cv2.COLOR_BGR2GRAY)
+def caja_por_pixeles(H_matrix, full):
+    # Método anterior (lienzo grande + umbral), sólo para los casos sin caja analítica;
+    # en la vista previa, sobre la copia reducida
+    src, s = (imagen, 1.0) if full else (proxy, proxy_scale)
+    S = np.diag([s, s, 1.0])
+    lienzo = cv2.warpPerspective(src, S @ H_matrix @ np.linalg.inv(S), (int(W * 2 * s), int(H * 2 * s)))
+    gray = cv2.cvtColor(lienzo, cv2.COLOR_BGR2GRAY)
     coords = cv2.findNonZero(cv2.threshold(gray, 1, 255, cv2.THRESH_BINARY)[1])
+    if coords is None:
+        return None
     x, y, w, h = cv2.boundingRect(coords)
+    return int(x / s), int(y / s), int(np.ceil(w / s)), int(np.ceil(h / s))
 
-    # Crop dinámico y resize proporcional
-    recortada = corregida_grande[y:y+h, x:x+w]
-    escala = min(W / w, H / h)
-    resized = cv2.resize(recortada, (int(w * escala), int(h * escala)))
-
-    # Centrar en canvas original
+def render(yaw_deg, pitch_deg, full):
+    H_matrix = homografia(yaw_deg, pitch_deg)
+    box = caja_visible(H_matrix) or caja_por_pixeles(H_matrix, full)
     canvas = np.zeros((H, W, 3), dtype=np.uint8)
-    oy = (H - resized.shape[0]) // 2
-    ox = (W - resized.shape[1]) // 2
-    canvas[oy:oy+resized.shape[0], ox:ox+resized.shape[1]] = resized
+    if box is not None:
+        # Recorte, escala y centrado van dentro de la homografía: un solo warp al
+        # tamaño de salida en vez de lienzo 2W×2H + recorte + resize
+        x, y, w, h = box
+        escala = min(W / w, H / h)
+        ox = (W - int(w * escala)) // 2
+        oy = (H - int(h * escala)) // 2
+        M = np.array([[escala, 0, ox - escala * x], [0, escala, oy - escala * y], [0, 0, 1]]) @ H_matrix
+        if full:
+            canvas = cv2.warpPerspective(imagen, M, (W, H))
+        else:
+            S = np.diag([proxy_scale, proxy_scale, 1.0])
+            M_proxy = S @ M @ np.linalg.inv(S)
+            small = cv2.warpPerspective(proxy, M_proxy, (proxy.shape[1], proxy.shape[0]))
+            canvas = cv2.resize(small, (W, H), interpolation=cv2.INTER_LINEAR)
 
     texto = f"Yaw: {yaw_deg}°, Pitch: {pitch_deg}°"
     cv2.putText(canvas, texto, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-    cv2.imshow("Homografía interactiva", canvas)
+    return canvas
+
+cv2.namedWindow("Homografía interactiva")
+cv2.createTrackbar("Yaw (-90° a +90°)", "Homografía interactiva", 90, 180, on_change)
+cv2.createTrackbar("Pitch (-90° a +90°)", "Homografía interactiva", 90, 180, on_change)
+
+shown = None        # (yaw, pitch) de la última vista previa
+last_change = 0.0
+full_done = False
+
+while True:
+    yaw_deg = cv2.getTrackbarPos("Yaw (-90° a +90°)", "Homografía interactiva") - 90
+    pitch_deg = cv2.getTrackbarPos("Pitch (-90° a +90°)", "Homografía interactiva") - 90
+
+    now = time.perf_counter()
+    if (yaw_deg, pitch_deg) != shown:
+        shown = (yaw_deg, pitch_deg)
+        last_change = now
+        full_done = proxy_scale == 1.0
+        cv2.imshow("Homografía interactiva", render(yaw_deg, pitch_deg, full=full_done))
+    elif not full_done and now - last_change >= SETTLE_S:
+        full_done = True
+        cv2.imshow("Homografía interactiva", render(yaw_deg, pitch_deg, full=True))
 
     key = cv2.waitKey(30)
     if key == 27 or key == ord('q'):
@@ -0,0 +1,227 @@
+import sys
+import queue
+import time
+import argparse
+
+from ble_manager import BLEManager, ESP32_ADDR, sync_command
+from ble_protocol import MAX_WINDOW
+from calibration import cargar_perfil
+from capture_writer import CaptureWriter, default_capture_path
+from device_sessions import SessionManager
+from distance_filters import FilteringSink
+from live_stream import LiveInclinometer
+
+# === Ingesta sin GUI ===
+# Misma conversación con el ESP32 que app.py, pero desde la línea de comandos y sin
+# PyQt5, para scripts de campo y bancos de reproducción:
+#   python ingest_cli.py sync
+#   python ingest_cli.py set --buffer 4000 --hz 10
+#   python ingest_cli.py fetch --binary --window 8 -o vuelo1.csv
+#   python ingest_cli.py live --duration 60
+#   python ingest_cli.py multi-fetch --device <addr1> --device <addr2> --binary
+EXIT_OK = 0
+EXIT_CONNECT = 1
+EXIT_COMMAND = 2
+EXIT_TIMEOUT = 3
+EXIT_WRITE = 4
+
+
+def log(args, msg, prefix=""):
+    if msg.startswith("DBG:") and not args.verbose:
+        return
+    if not args.quiet or msg.startswith(("Error", "No se encontró", "❌")):
+        print(prefix + msg, file=sys.stderr)
+
+
+def drain(args, msg_q, prefix=""):
+    while not msg_q.empty():
+        log(args, msg_q.get().strip(), prefix)
+
+
+class Session:
+    def __init__(self, args, client_factory=None):
+        self.args = args
+        self.msg_q = queue.Queue()
+        self.ble = BLEManager(self.msg_q, client_factory=client_factory,
+                              window=args.window, address=args.address)
+
+    def log(self, msg):
+        log(self.args, msg)
+
+    def drain(self):
+        drain(self.args, self.msg_q)
+
+    def wait_for(self, predicate, timeout):
+        # El plazo se renueva con cada mensaje: sólo falla si el ESP32 deja de hablar
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                msg = self.msg_q.get(timeout=remaining).strip()
+            except queue.Empty:
+                return None
+            self.log(msg)
+            if predicate(msg):
+                return msg
+            deadline = time.monotonic() + timeout
+
+    def connect(self):
+        ok = self.ble.connect().result(timeout=self.args.timeout + 10)
+        self.drain()
+        return ok
+
+    def send(self, cmd):
+        return self.ble.send(cmd).result(timeout=self.args.timeout)
+
+    def close(self):
+        self.drain()
+        fut = self.ble.close()
+        if fut is not None:
+            try:
+                fut.result(timeout=self.args.timeout)
+            except Exception as e:
+                self.log(f"DBG: error al desconectar: {e}")
+
+
+def cmd_sync(session, args):
+    return EXIT_OK if session.send(sync_command()) else EXIT_COMMAND
+
+
+def cmd_set(session, args):
+    return EXIT_OK if session.send(f"SET:{args.buffer},{args.hz}") else EXIT_COMMAND
+
+
+def cmd_reset(session, args):
+    return EXIT_OK if session.send("RESET") else EXIT_COMMAND
+
+
+def cmd_mem(session, args):
+    if not session.send("GET_MEM"):
+        return EXIT_COMMAND
+    msg = session.wait_for(lambda m: m.startswith("FREE_HEAP:"), args.timeout)
+    if msg is None:
+        return EXIT_TIMEOUT
+    print(msg.split(":", 1)[1])
+    return EXIT_OK
+
+
+def cmd_fetch(session, args):
+    out = args.output or default_capture_path()
+    capture = CaptureWriter(out)
+    sink = FilteringSink(capture) if args.filter else capture
+    session.ble.fetch(sink, binary=args.binary, window=args.window)
+    msg = session.wait_for(lambda m: m == "END", args.timeout)
+    if msg is None:
+        session.ble.abort_fetch()
+    capture.close(wait=True, timeout=args.timeout)
+    if capture.error:
+        print(f"Error al escribir {out}: {capture.error}", file=sys.stderr)
+        return EXIT_WRITE
+    if msg is None:
+        print(f"❌ FETCH sin respuesta ({capture.rows} muestras guardadas en {out})", file=sys.stderr)
+        return EXIT_TIMEOUT
+    if args.filter:
+        session.log(sink.filter.describe())
+    print(out)
+    return EXIT_OK
+
+
+def cmd_live(session, args):
+    live = LiveInclinometer(perfil=cargar_perfil(args.calibration))
+    session.ble.live_sink = live.push_records
+    if not session.send("LIVE:1"):
+        return EXIT_COMMAND
+    end = time.monotonic() + args.duration if args.duration else None
+    last = 0
+    try:
+        while end is None or time.monotonic() < end:
+            time.sleep(args.interval)
+            session.drain()
+            if live.total != last:
+                last = live.total
+                print(live.describe(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.send("LIVE:0")
+    return EXIT_OK if last else EXIT_TIMEOUT
+
+
+def multi_fetch(args, client_factory=None):
+    manager = SessionManager(args.devices, client_factory=client_factory,
+                             window=args.window, scan_timeout=args.scan_timeout)
+    results = []
+    try:
+        connected = manager.connect_all(timeout=args.scan_timeout + args.timeout)
+        if any(connected):
+            results = manager.fetch_all(args.out_dir, binary=args.binary, timeout=args.timeout)
+    finally:
+        for s in manager.sessions:
+            drain(args, s.msg_q, prefix=f"[{s.address}] ")
+        manager.close(timeout=args.timeout)
+    for s in manager.sessions:
+        print(s.describe())
+    if not any(connected):
+        return EXIT_CONNECT
+    return EXIT_OK if all(connected) and all(results) else EXIT_TIMEOUT
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ingesta del ESP32-VL53L1X sin GUI")
+    parser.add_argument("--address", default=ESP32_ADDR, help="dirección BLE del ESP32")
+    parser.add_argument("--timeout", type=float, default=15.0,
+                        help="segundos sin mensajes del ESP32 antes de abortar")
+    parser.add_argument("--window", type=int, default=8, help=f"bloques en vuelo (1-{MAX_WINDOW})")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostrar mensajes DBG")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sync", help="sincronizar reloj e iniciar grabación").set_defaults(func=cmd_sync)
+
+    p_set = sub.add_parser("set", help="configurar buffer y frecuencia")
+    p_set.add_argument("--buffer", type=int, default=100)
+    p_set.add_argument("--hz", type=int, default=2)
+    p_set.set_defaults(func=cmd_set)
+
+    p_fetch = sub.add_parser("fetch", help="descargar la captura a CSV")
+    p_fetch.add_argument("-o", "--output", help="CSV de salida (por defecto esp32_data_<fecha>.csv)")
+    p_fetch.add_argument("--binary", action="store_true", help="usar FETCH_BIN")
+    p_fetch.add_argument("--filter", action="store_true",
+                         help="guardar dropouts y lecturas atípicas como -1 (filtro Hampel)")
+    p_fetch.set_defaults(func=cmd_fetch)
+
+    p_live = sub.add_parser("live", help="mostrar la inclinación de la pared en vivo")
+    p_live.add_argument("--duration", type=float, default=0, help="segundos (0 = hasta Ctrl+C)")
+    p_live.add_argument("--interval", type=float, default=0.2)
+    p_live.add_argument("--calibration", help="perfil de calibración JSON (por defecto calibration.json)")
+    p_live.set_defaults(func=cmd_live)
+
+    p_multi = sub.add_parser("multi-fetch", help="descargar varias placas a la vez")
+    p_multi.add_argument("--device", dest="devices", action="append", required=True,
+                         help="dirección BLE (repetir por placa)")
+    p_multi.add_argument("--out-dir", default=".")
+    p_multi.add_argument("--binary", action="store_true", help="usar FETCH_BIN")
+    p_multi.add_argument("--scan-timeout", type=float, default=5.0)
+
+    sub.add_parser("mem", help="consultar memoria libre").set_defaults(func=cmd_mem)
+    sub.add_parser("reset", help="reiniciar el buffer del ESP32").set_defaults(func=cmd_reset)
+    return parser
+
+
+def main(argv=None, client_factory=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "multi-fetch":
+        return multi_fetch(args, client_factory)
+    session = Session(args, client_factory)
+    try:
+        if not session.connect():
+            return EXIT_CONNECT
+        return args.func(session, args)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
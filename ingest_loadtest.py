@@ -0,0 +1,172 @@
+import os
+import time
+import queue
+import tempfile
+import threading
+import argparse
+
+import numpy as np
+
+from ble_manager import BLEManager
+from capture_writer import CaptureWriter
+from fake_esp32 import FakeESP32Client, sintetizar_muestras, cargar_muestras_csv
+from live_stream import LiveInclinometer
+
+# === Prueba de carga de la ingesta sin hardware ===
+# Reproduce una captura (p. ej. first_test.csv) o una sintética desde el ESP32
+# simulado a través de BLEManager, CaptureWriter y un consumidor que imita el
+# QTimer de MainWindow._process_queue. Reporta rendimiento y percentiles de latencia:
+#   python ingest_loadtest.py --csv first_test.csv --binary --window 8
+#   python ingest_loadtest.py --samples 4000 --rate 0 --window 1,8     (ráfaga)
+#   python ingest_loadtest.py --csv first_test.csv --live --speed 20
+PERCENTILES = (50, 90, 99)
+
+
+class TimedQueue(queue.Queue):
+    # Cola de mensajes que mide cuánto espera cada mensaje hasta ser consumido
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.latencies = []
+
+    def _put(self, item):
+        self.queue.append((time.perf_counter(), item))
+
+    def _get(self):
+        t, item = self.queue.popleft()
+        self.latencies.append(time.perf_counter() - t)
+        return item
+
+
+class TimingSink:
+    # Envuelve el sink real y mide latencia emisión (ESP32 simulado) → entrega al sink
+    def __init__(self, sink, fake):
+        self.sink = sink
+        self.fake = fake
+        self.count = 0
+        self.latencies = []
+
+    def writerows(self, rows):
+        # Si el sink está saturado (queue.Full) las filas se reenviarán: no cuentan
+        self.sink.writerows(rows)
+        now = time.perf_counter()
+        self.latencies.extend(now - t for t in self.fake.sent_at[self.count:self.count + len(rows)])
+        self.count += len(rows)
+
+    def mark_block(self, on_durable=None):
+        self.sink.mark_block(on_durable)
+
+    def push_records(self, records):
+        now = time.perf_counter()
+        self.latencies.extend(now - t for t in self.fake.sent_at[self.count:self.count + len(records)])
+        self.count += len(records)
+        self.sink.push_records(records)
+
+
+def consume_like_gui(msg_q, stop, poll_s, handled):
+    # Mismo patrón que MainWindow: drenar la cola entera en cada tick del timer
+    while not stop.is_set():
+        while not msg_q.empty():
+            msg = msg_q.get().strip()
+            if msg == "END":
+                stop.set()
+            handled.append(msg)
+        time.sleep(poll_s)
+
+
+def percentiles_ms(values):
+    if not values:
+        return "sin datos"
+    arr = np.asarray(values) * 1000.0
+    parts = [f"p{p} {np.percentile(arr, p):.1f}" for p in PERCENTILES]
+    return " / ".join(parts) + f" / máx {arr.max():.1f} ms"
+
+
+def run_fetch(samples, args, window):
+    msg_q = TimedQueue()
+    fake = FakeESP32Client(samples=samples, mtu_size=args.mtu, latency=args.latency, loss=args.loss,
+                           text_delay=args.delay, bin_delay=args.delay)
+    ble = BLEManager(msg_q, client_factory=lambda addr: fake)
+    ble.connect().result(timeout=5)
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    capture = CaptureWriter(path)
+    sink = TimingSink(capture, fake)
+    stop, handled = threading.Event(), []
+    gui = threading.Thread(target=consume_like_gui, args=(msg_q, stop, args.poll_ms / 1000.0, handled))
+
+    t0 = time.perf_counter()
+    gui.start()
+    ble.fetch(sink, binary=args.binary, window=window)
+    gui.join(args.timeout)
+    t_end = time.perf_counter()
+    capture.close(wait=True)
+    t_durable = time.perf_counter()
+    ble.close()
+    os.remove(path)
+
+    elapsed = t_end - t0
+    modo = "binario" if args.binary else "texto"
+    print(f"⏱️ FETCH {modo} ventana={window}: {capture.rows}/{len(samples)} muestras en {elapsed:.2f} s "
+          f"({capture.rows / elapsed:.0f} muestras/s), {fake.notifications} notificaciones, "
+          f"{fake.retransmissions} reenvíos")
+    print(f"   emisión → CaptureWriter: {percentiles_ms(sink.latencies)}")
+    print(f"   cola GUI ({len(handled)} mensajes, tick {args.poll_ms} ms): {percentiles_ms(msg_q.latencies)}")
+    print(f"   cierre + fsync final: {(t_durable - t_end) * 1000:.1f} ms, {capture.syncs} fsync")
+    return capture.rows == len(samples)
+
+
+def run_live(samples, args):
+    msg_q = TimedQueue()
+    fake = FakeESP32Client(samples=samples, live_speed=args.speed, live_hz=args.live_hz)
+    ble = BLEManager(msg_q, client_factory=lambda addr: fake)
+    ble.connect().result(timeout=5)
+    live = LiveInclinometer()
+    sink = TimingSink(live, fake)
+    ble.live_sink = sink.push_records
+
+    t0 = time.perf_counter()
+    ble.set_live(True).result(timeout=5)
+    deadline = t0 + args.timeout
+    while sink.count < len(samples) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - t0
+    ble.set_live(False).result(timeout=5)
+    ble.close()
+
+    print(f"⏱️ En vivo: {sink.count}/{len(samples)} muestras en {elapsed:.2f} s "
+          f"({sink.count / elapsed:.1f} muestras/s)")
+    print(f"   emisión → inclinación calculada: {percentiles_ms(sink.latencies)}")
+    print(f"   {live.describe()}")
+    return sink.count == len(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la ingesta con un ESP32 simulado")
+    parser.add_argument("--csv", help="captura a reproducir (por defecto, sintética)")
+    parser.add_argument("--samples", type=int, default=4000, help="muestras sintéticas")
+    parser.add_argument("--binary", action="store_true", help="FETCH_BIN en lugar de texto")
+    parser.add_argument("--window", default="8", help="ventana(s) de ACK, p. ej. 1,4,8")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="notificaciones de datos por segundo (0 = ráfaga sin pausa)")
+    parser.add_argument("--latency", type=float, default=0.03, help="latencia de escritura del host (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="probabilidad de perder una notificación")
+    parser.add_argument("--mtu", type=int, default=247)
+    parser.add_argument("--poll-ms", type=int, default=200, help="periodo del QTimer emulado")
+    parser.add_argument("--live", action="store_true", help="reproducir en modo en vivo")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="en vivo: factor sobre el ritmo real de la captura")
+    parser.add_argument("--live-hz", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args(argv)
+    args.delay = 1.0 / args.rate if args.rate > 0 else 0.0
+
+    samples = cargar_muestras_csv(args.csv) if args.csv else sintetizar_muestras(args.samples)
+    if args.live:
+        return 0 if run_live(samples, args) else 1
+    ok = all([run_fetch(samples, args, int(w)) for w in args.window.split(",")])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+import threading
+
+import numpy as np
+
+from ble_protocol import reloj_esp32_ms
+from sensor_functions import calcular_inclinacion_pared_lote
+
+# === Modo en vivo ===
+# Con LIVE:1 el ESP32 notifica cada muestra en cuanto la toma (tramas LIVE_MAGIC).
+# El host guarda las últimas `capacity` muestras en un buffer circular de tamaño
+# fijo y calcula pitch/yaw de la pared por notificación (en lote), así la memoria no crece
+# por larga que sea la sesión.
+FIELDS = ("timestamp", "side", "top", "bottom", "pitch", "yaw", "delay_ms")
+
+
+class LiveInclinometer:
+    def __init__(self, capacity=1024, perfil=None):
+        self.capacity = capacity
+        self.perfil = perfil
+        self._data = np.full((capacity, len(FIELDS)), np.nan)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self):
+        # Muestras recibidas desde el último clear(), incluidas las ya sobrescritas
+        return self._count
+
+    # Sink de BLEManager.live_sink: registros (ts_ms, dist1, dist2, dist3)
+    def push_records(self, records):
+        if not records:
+            return
+        rec = np.asarray(records, dtype=float)
+        ts_ms, side, top, bottom = rec.T
+        pitch, yaw, _ = calcular_inclinacion_pared_lote(bottom, side, top, self.perfil)
+        rows = np.column_stack([ts_ms / 1000.0, side, top, bottom, pitch, yaw,
+                                reloj_esp32_ms() - ts_ms])[-self.capacity:]
+        with self._lock:
+            idx = (self._count + len(rec) - len(rows) + np.arange(len(rows))) % self.capacity
+            self._data[idx] = rows
+            self._count += len(rec)
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None
+            row = self._data[(self._count - 1) % self.capacity].copy()
+        return dict(zip(FIELDS, row))
+
+    def snapshot(self, n=None):
+        # Últimas n muestras en orden cronológico (copia)
+        with self._lock:
+            size = len(self)
+            n = size if n is None else min(n, size)
+            idx = (np.arange(self._count - n, self._count)) % self.capacity
+            return self._data[idx].copy()
+
+    def clear(self):
+        with self._lock:
+            self._data.fill(np.nan)
+            self._count = 0
+
+    def describe(self):
+        last = self.latest()
+        if last is None:
+            return "Pared: sin datos en vivo"
+        if np.isnan(last["pitch"]):
+            return f"Pared: lectura inválida (side {last['side']:.0f} / top {last['top']:.0f} / bottom {last['bottom']:.0f})"
+        return (f"Pared: pitch {last['pitch']:.2f}° | yaw {last['yaw']:.2f}° "
+                f"| retardo {last['delay_ms']:.0f} ms")
@@ -1,40 +1,52 @@
-import os
+import time
+import argparse
 import pandas as pd
 
+from session_stats import agregar_sesiones
+
 # 📂 Ruta a la carpeta con los CSV
 FOLDER_PATH = "data"  # <--- cámbialo
 
 # 📄 CSV de salida
 OUTPUT_FILE = "calibration_data.csv"
 
-# 🧱 Datos promediados
-data = []
-
-# 🔁 Iterar sobre cada archivo CSV en la carpeta
-for filename in os.listdir(FOLDER_PATH):
-    if filename.endswith(".csv"):
-        filepath = os.path.join(FOLDER_PATH, filename)
-        df = pd.read_csv(filepath)
-
-        # Verificamos columnas esperadas
-        if not {'side', 'top', 'bottom'}.issubset(df.columns):
-            print(f"⚠️  Archivo ignorado por columnas faltantes: {filename}")
-            continue
-
-        side_avg   = df["side"].mean()
-        top_avg    = df["top"].mean()
-        bottom_avg = df["bottom"].mean()  # Este es Z real
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Promedios por sesión de calibración")
+    parser.add_argument("folder", nargs="?", default=FOLDER_PATH)
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="releer todos los archivos")
+    args = parser.parse_args(argv)
+
+    # 🔁 Sólo se leen (en paralelo, por trozos) los archivos nuevos o modificados;
+    # el resto sale de la caché. Sin dropouts (-1) ni picos en los promedios.
+    t0 = time.perf_counter()
+    stats, read, errors = agregar_sesiones(args.folder, workers=args.workers, use_cache=not args.no_cache)
+    for filename, error in errors.items():
+        print(f"⚠️  Archivo ignorado: {filename} ({error})")
+
+    # 🧱 Datos promediados
+    data = []
+    for filename, s in stats.items():
+        bottom_avg = s["bottom"].mean  # Este es Z real
         print(bottom_avg)
         data.append({
             "z_real_mm": bottom_avg,
-            "side_avg_mm": side_avg,
-            "top_avg_mm": top_avg
+            "side_avg_mm": s["side"].mean,
+            "top_avg_mm": s["top"].mean
         })
 
-# 📤 Guardar todo a un nuevo CSV
-output_df = pd.DataFrame(data)
-output_df.sort_values("z_real_mm", inplace=True)
-output_df.to_csv(OUTPUT_FILE, index=False)
+    # 📤 Guardar todo a un nuevo CSV
+    output_df = pd.DataFrame(data, columns=["z_real_mm", "side_avg_mm", "top_avg_mm"])
+    output_df.sort_values("z_real_mm", inplace=True)
+    output_df.to_csv(args.output, index=False)
+
+    print(f"📊 {len(stats)} sesiones ({read - len(errors)} leídas, {len(stats) - read + len(errors)} desde caché) "
+          f"en {time.perf_counter() - t0:.2f} s")
+    print(f"✅ Datos promediados guardados en: {args.output}")
+    return 0
+
 
-print(f"✅ Datos promediados guardados en: {OUTPUT_FILE}")
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# === Corrección de perspectiva a partir de la normal del plano ===
+# La cámara se gira (homografía de rotación pura K·Rᵀ·K⁻¹) hasta mirar de frente
+# al plano de normal `normal` (sistema de la cámara). Sin GUI: lo usan toolvideo
+# al guardar un waypoint y batch_rectify en los procesos del pool.
+#
+# Frames seguidos tienen casi la misma normal: en vez de un warpPerspective por
+# frame, la normal se cuantiza (azimut/elevación a pasos de step_deg) y los mapas
+# de cv2.remap para esa normal se calculan una vez, en punto fijo (CV_16SC2, la
+# misma interpolación que usa warpPerspective por dentro), y quedan en un LRU con
+# tope de memoria con clave (resolución, intrínsecos, normal cuantizada).
+# Con step_deg = 0 el resultado coincide con warpPerspective a ±1 nivel de gris en
+# el interior; en el borde contra el negro (1–2 px) los mapas en punto fijo
+# redondean distinto y la diferencia llega a 3–4 niveles.
+FOCAL_PX = 1000
+DEFAULT_STEP_DEG = 0.1  # a f = 1000 px, 0.1° ≈ 1.7 px en el centro de la imagen
+DEFAULT_MAPS_MB = 256
+
+
+def matriz_intrinseca(W, H, f=FOCAL_PX):
+    return np.array([[f, 0, W / 2], [0, f, H / 2], [0, 0, 1]])
+
+
+def homografia_rectificacion(normal, W, H, f=FOCAL_PX):
+    K = matriz_intrinseca(W, H, f)
+
+    z_axis = np.asarray(normal, dtype=float) / np.linalg.norm(normal)
+    x_axis = np.cross(np.array([0, 1, 0]), z_axis)
+    x_axis /= np.linalg.norm(x_axis)
+    y_axis = np.cross(z_axis, x_axis)
+    R = np.vstack([x_axis, y_axis, z_axis]).T
+
+    return K @ R.T @ np.linalg.inv(K)
+
+
+def cuantizar_normal(normal, step_deg=DEFAULT_STEP_DEG):
+    # (clave entera, normal reconstruida) redondeando azimut y elevación a step_deg;
+    # step_deg = 0 no cuantiza (la clave es la normal exacta)
+    n = np.asarray(normal, dtype=float) / np.linalg.norm(normal)
+    if not step_deg:
+        return tuple(n.tolist()), n
+    az = np.degrees(np.arctan2(n[0], n[2]))
+    el = np.degrees(np.arcsin(np.clip(n[1], -1, 1)))
+    key = (int(round(az / step_deg)), int(round(el / step_deg)))
+    az, el = np.radians(key[0] * step_deg), np.radians(key[1] * step_deg)
+    return key, np.array([np.sin(az) * np.cos(el), np.sin(el), np.cos(az) * np.cos(el)])
+
+
+def mapas_remap(H_matrix, W, H):
+    # Para cada píxel de salida, su origen en la imagen (inversa de la homografía),
+    # convertido a punto fijo para cv2.remap
+    Hinv = np.linalg.inv(H_matrix).astype(np.float32)
+    xs = np.arange(W, dtype=np.float32)[None, :]
+    ys = np.arange(H, dtype=np.float32)[:, None]
+    w = Hinv[2, 0] * xs + Hinv[2, 1] * ys + Hinv[2, 2]
+    # Sobre el horizonte (w = 0) se hace como warpPerspective: 1/w se toma como 0
+    inv_w = np.divide(1, w, out=np.zeros_like(w), where=w != 0)
+    map_x = (Hinv[0, 0] * xs + Hinv[0, 1] * ys + Hinv[0, 2]) * inv_w
+    map_y = (Hinv[1, 0] * xs + Hinv[1, 1] * ys + Hinv[1, 2]) * inv_w
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+
+class RectificationEngine:
+    def __init__(self, step_deg=DEFAULT_STEP_DEG, max_mb=DEFAULT_MAPS_MB, f=FOCAL_PX):
+        self.step_deg = step_deg
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.f = f
+        self.hits = 0
+        self.misses = 0
+        self._maps = OrderedDict()  # clave → (map1, map2), en orden de uso
+        self._bytes = 0
+
+    def mapas(self, normal, W, H):
+        qkey, qnormal = cuantizar_normal(normal, self.step_deg)
+        key = (W, H, self.f, W / 2, H / 2, qkey)
+        maps = self._maps.get(key)
+        if maps is not None:
+            self.hits += 1
+            self._maps.move_to_end(key)
+            return maps
+        self.misses += 1
+        maps = mapas_remap(homografia_rectificacion(qnormal, W, H, self.f), W, H)
+        self._maps[key] = maps
+        self._bytes += sum(m.nbytes for m in maps)
+        while self._bytes > self.max_bytes and len(self._maps) > 1:
+            _, old = self._maps.popitem(last=False)
+            self._bytes -= sum(m.nbytes for m in old)
+        return maps
+
+    def rectificar(self, img, normal):
+        H, W = img.shape[:2]
+        map1, map2 = self.mapas(normal, W, H)
+        return cv2.remap(img, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+    def stats(self):
+        return {"maps": len(self._maps), "mb": self._bytes / 1e6, "hits": self.hits, "misses": self.misses}
+
+
+_engine = RectificationEngine()
+
+
+def corregir_perspectiva(img, normal, frame_index=None, pitch=None, yaw=None, engine=None):
+    corrected = (engine or _engine).rectificar(img, normal)
+
+    # Overlay con parámetros aplicados directamente en la imagen corregida
+    if pitch is not None and yaw is not None:
+        text = f"Frame: {frame_index} | Pitch: {pitch:.2f}° | Yaw: {yaw:.2f}°"
+        cv2.putText(corrected, text, (30, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+
+    return corrected
@@ -1,30 +1,15 @@
 import numpy as np
 
+from calibration import cargar_perfil
 
 
-def calcular_inclinacion_pared(d_bottom, d_side, d_top):
-    
-    # Calibración previa
-    theta_side_deg = 16.09  # inclinación horizontal
-    theta_top_deg  = 14.54  # inclinación vertical
-
-    # Posiciones relativas
-    delta_x_side = -60  # mm (izquierda de bottom)
-    delta_y_top  = 25  # mm (encima de bottom)
-    
-    # Convertir ángulos a radianes
-    theta_side = np.radians(theta_side_deg)
-    theta_top  = np.radians(theta_top_deg)
-
-    # Vectores unitarios de cada sensor
-    v_bottom = np.array([0.0, 0.0, -1.0])  # referencia perpendicular
-    v_side   = np.array([np.sin(theta_side), 0.0, -np.cos(theta_side)])  # horizontal
-    v_top    = np.array([0.0, np.sin(theta_top), -np.cos(theta_top)])    # vertical
-
-    # Posiciones relativas
-    o_bottom = np.array([0.0, 0.0, 0.0])
-    o_side   = np.array([delta_x_side, 0.0, 0.0])
-    o_top    = np.array([0.0, delta_y_top, 0.0])
+def calcular_inclinacion_pared(d_bottom, d_side, d_top, perfil=None):
+    # perfil: CalibrationProfile (por defecto calibration.json); vectores y
+    # orígenes de los sensores ya vienen precalculados en él
+    perfil = perfil or cargar_perfil()
+    v_bottom, v_side, v_top = perfil.vectors
+    o_bottom, o_side, o_top = perfil.origins
+    d_bottom, d_side, d_top = d_bottom - perfil.bias[0], d_side - perfil.bias[1], d_top - perfil.bias[2]
 
     # Puntos 3D de impacto
     p_bottom = o_bottom + d_bottom * v_bottom
@@ -48,18 +33,46 @@ def calcular_inclinacion_pared(d_bottom, d_side, d_top):
 
     return pitch_deg, yaw_deg, normal
 
-# === 🧪 EJEMPLO DE USO ===
 
-d_bottom = 551.38  # mm
-d_side   = 574.1
-d_top    = 569.43
+def calcular_inclinacion_pared_lote(d_bottom, d_side, d_top, perfil=None):
+    # Versión vectorizada para una captura entera: arrays de N lecturas por sensor.
+    # Devuelve pitch (N,), yaw (N,) y normales (N, 3) con la misma convención que
+    # calcular_inclinacion_pared. Las filas con alguna lectura inválida (-1, 0 o NaN)
+    # quedan en NaN.
+    perfil = perfil or cargar_perfil()
+    v_bottom, v_side, v_top = perfil.vectors
+    o_bottom, o_side, o_top = perfil.origins
+    d = np.stack(np.broadcast_arrays(np.asarray(d_bottom, dtype=float),
+                                     np.asarray(d_side, dtype=float),
+                                     np.asarray(d_top, dtype=float)), axis=-1).reshape(-1, 3)
+    valid = np.all(d > 0, axis=1)  # NaN > 0 es False
+    d = d - perfil.bias
+
+    p_bottom = o_bottom + d[:, 0, None] * v_bottom
+    p_side   = o_side   + d[:, 1, None] * v_side
+    p_top    = o_top    + d[:, 2, None] * v_top
+
+    normal = np.cross(p_side - p_bottom, p_top - p_bottom)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normal /= np.linalg.norm(normal, axis=1, keepdims=True)
+    normal[~valid] = np.nan
+
+    yaw_deg   = np.degrees(np.arctan2(normal[:, 0], -normal[:, 2]))
+    pitch_deg = np.degrees(np.arctan2(normal[:, 1], -normal[:, 2]))
 
+    return pitch_deg, yaw_deg, normal
+
+# === 🧪 EJEMPLO DE USO ===
 
+if __name__ == "__main__":
+    d_bottom = 551.38  # mm
+    d_side   = 574.1
+    d_top    = 569.43
 
-pitch, yaw, normal = calcular_inclinacion_pared(
-    d_bottom, d_side, d_top
-)
+    pitch, yaw, normal = calcular_inclinacion_pared(
+        d_bottom, d_side, d_top
+    )
 
-print(f"✅ Inclinación vertical (pitch): {pitch:.2f}°")
-print(f"✅ Inclinación horizontal (yaw): {yaw:.2f}°")
-print(f"🧭 Normal estimada del plano: {normal}")
+    print(f"✅ Inclinación vertical (pitch): {pitch:.2f}°")
+    print(f"✅ Inclinación horizontal (yaw): {yaw:.2f}°")
+    print(f"🧭 Normal estimada del plano: {normal}")
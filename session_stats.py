@@ -0,0 +1,206 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from capture_format import CAPTURE_EXT, Captura
+from distance_filters import CHANNELS, filtrar_canal
+
+# === Estadísticas por sesión, incrementales y en paralelo ===
+# Cada captura se resume en contadores mezclables por canal (n, válidas, suma,
+# suma de cuadrados, mín, máx): el resumen de varias partes o de varios archivos
+# es la suma de los resúmenes, sin volver a leer nada.
+# Los archivos se leen por trozos en un pool de procesos y el resumen se guarda en
+# una caché JSON junto a los datos, con clave (ruta, mtime, tamaño): en la siguiente
+# pasada sólo se leen los archivos nuevos o modificados.
+CACHE_NAME = ".session_stats.json"
+CACHE_VERSION = 1  # subir si cambia el filtro o el formato de los resúmenes
+CHUNK_ROWS = 100_000
+FILTER_WINDOW = 11
+
+
+class ChannelStats:
+    def __init__(self, count=0, valid=0, total=0.0, sumsq=0.0, min=np.inf, max=-np.inf):
+        self.count = count
+        self.valid = valid
+        self.total = total
+        self.sumsq = sumsq
+        self.min = min
+        self.max = max
+
+    @classmethod
+    def from_array(cls, values):
+        # values con NaN en las lecturas rechazadas
+        ok = values[~np.isnan(values)]
+        if not len(ok):
+            return cls(count=len(values))
+        return cls(len(values), len(ok), float(ok.sum()), float(ok @ ok), float(ok.min()), float(ok.max()))
+
+    def merge(self, other):
+        return ChannelStats(self.count + other.count, self.valid + other.valid,
+                            self.total + other.total, self.sumsq + other.sumsq,
+                            min(self.min, other.min), max(self.max, other.max))
+
+    __add__ = merge
+
+    @property
+    def mean(self):
+        return self.total / self.valid if self.valid else np.nan
+
+    @property
+    def std(self):
+        if self.valid < 2:
+            return np.nan
+        var = (self.sumsq - self.total ** 2 / self.valid) / (self.valid - 1)
+        return float(np.sqrt(max(var, 0.0)))
+
+    def to_dict(self):
+        return {"count": self.count, "valid": self.valid, "total": self.total, "sumsq": self.sumsq,
+                "min": self.min if self.valid else None, "max": self.max if self.valid else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["count"], d["valid"], d["total"], d["sumsq"],
+                   np.inf if d["min"] is None else d["min"], -np.inf if d["max"] is None else d["max"])
+
+
+class SessionStats:
+    # Un ChannelStats por sensor
+    def __init__(self, channels=None):
+        self.channels = channels or {c: ChannelStats() for c in CHANNELS}
+
+    def __getitem__(self, channel):
+        return self.channels[channel]
+
+    def merge(self, other):
+        return SessionStats({c: self.channels[c] + other.channels[c] for c in CHANNELS})
+
+    __add__ = merge
+
+    def to_dict(self):
+        return {c: s.to_dict() for c, s in self.channels.items()}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls({c: ChannelStats.from_dict(d[c]) for c in CHANNELS})
+
+
+def _leer_trozos(path, chunk_rows):
+    # Trozos (side, top, bottom) como arrays float, sin cargar el archivo entero
+    if path.endswith(CAPTURE_EXT):
+        cap = Captura(path)
+        for start in range(0, len(cap), chunk_rows):
+            rec = cap.records[start:start + chunk_rows]
+            yield np.column_stack([rec[c].astype(float) for c in CHANNELS])
+        return
+    for df in pd.read_csv(path, usecols=list(CHANNELS), chunksize=chunk_rows):
+        yield df[list(CHANNELS)].to_numpy(dtype=float)
+
+
+def _trozos_filtrados(chunks, half):
+    # El filtro Hampel usa una ventana centrada: cada trozo se filtra con `half`
+    # filas de contexto a cada lado, así el resultado es idéntico al del archivo entero
+    prev = cur = None
+    for nxt in chunks:
+        if cur is not None:
+            yield _filtrar_con_contexto(prev, cur, nxt[:half], half)
+            prev = cur[-half:] if len(cur) >= half else np.vstack([prev, cur])[-half:]
+        else:
+            prev = np.empty((0, len(CHANNELS)))
+        cur = nxt
+    if cur is not None:
+        yield _filtrar_con_contexto(prev, cur, np.empty((0, len(CHANNELS))), half)
+
+
+def _filtrar_con_contexto(before, chunk, after, half):
+    block = np.vstack([before, chunk, after])
+    out = np.column_stack([filtrar_canal(block[:, i], window=2 * half + 1) for i in range(len(CHANNELS))])
+    return out[len(before):len(before) + len(chunk)]
+
+
+def stats_archivo(path, chunk_rows=CHUNK_ROWS, filtrar=True):
+    stats = SessionStats()
+    chunks = _leer_trozos(path, chunk_rows)
+    if filtrar:
+        chunks = _trozos_filtrados(chunks, FILTER_WINDOW // 2)
+    for block in chunks:
+        part = SessionStats({c: ChannelStats.from_array(block[:, i]) for i, c in enumerate(CHANNELS)})
+        stats = stats + part
+    return stats
+
+
+def _stats_archivo_dict(args):
+    path, chunk_rows, filtrar = args
+    try:
+        return stats_archivo(path, chunk_rows, filtrar).to_dict()
+    except ValueError as e:  # columnas faltantes, .scap inválido
+        return {"error": str(e)}
+
+
+class StatsCache:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _stamp(path, filtrar):
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size, bool(filtrar)]
+
+    def get(self, path, filtrar):
+        entry = self.entries.get(os.path.abspath(path))
+        if entry and entry["stamp"] == self._stamp(path, filtrar):
+            return SessionStats.from_dict(entry["stats"])
+        return None
+
+    def put(self, path, filtrar, stats):
+        self.entries[os.path.abspath(path)] = {"stamp": self._stamp(path, filtrar), "stats": stats.to_dict()}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+def agregar_sesiones(folder, workers=None, chunk_rows=CHUNK_ROWS, filtrar=True, use_cache=True):
+    # ({archivo: SessionStats}, archivos leídos de disco, {archivo: error})
+    files = sorted(f for f in os.listdir(folder) if f.endswith((".csv", CAPTURE_EXT)))
+    cache = StatsCache(os.path.join(folder, CACHE_NAME)) if use_cache else None
+    result, pending = {}, []
+    for name in files:
+        path = os.path.join(folder, name)
+        cached = cache.get(path, filtrar) if cache else None
+        if cached is not None:
+            result[name] = cached
+        else:
+            pending.append(name)
+
+    jobs = [(os.path.join(folder, name), chunk_rows, filtrar) for name in pending]
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(pool.map(_stats_archivo_dict, jobs))
+    else:
+        computed = [_stats_archivo_dict(job) for job in jobs]
+
+    errors = {}
+    for name, data in zip(pending, computed):
+        if "error" in data:
+            errors[name] = data["error"]
+            continue
+        stats = SessionStats.from_dict(data)
+        result[name] = stats
+        if cache:
+            cache.put(os.path.join(folder, name), filtrar, stats)
+    if cache and pending:
+        cache.save()
+    return {name: result[name] for name in files if name in result}, len(pending), errors
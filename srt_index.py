@@ -0,0 +1,181 @@
+import os
+import re
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from srt_telemetry import COLUMNS, SrtTelemetry, cargar_sidecar, cargar_telemetria, parse_srt_text
+
+# === Acceso perezoso a un SRT largo ===
+# Un solo barrido sobre los bytes (mmap) localiza los </font> que cierran cada
+# bloque de subtítulo; se guarda el desplazamiento de uno de cada `stride` bloques
+# y el FrameCnt con que empieza cada tramo. Pedir el frame N sólo decodifica su
+# tramo (parse_srt_text sobre unos KB) y los últimos tramos usados quedan en un LRU.
+# El índice, de tamaño stride veces menor que el SRT en bloques, se guarda junto al
+# video (<video>.srtidx) con la misma validación por tamaño/mtime que el sidecar.
+INDEX_EXT = ".srtidx"
+INDEX_MAGIC = b"SIDX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHHQqQQ")  # magic, versión, stride, tamaño SRT, mtime_ns, bloques, tramos
+DEFAULT_STRIDE = 256
+DEFAULT_CACHE_CHUNKS = 8
+
+_END = re.compile(rb"</font>")
+_FRAME = re.compile(rb"FrameCnt: (\d+)")
+
+
+class SrtIndex:
+    def __init__(self, offsets, first_frames, n_blocks, stride):
+        self.offsets = offsets            # (tramos + 1,) bytes donde empieza cada tramo y fin
+        self.first_frames = first_frames  # (tramos,) primer frame (0-based) de cada tramo
+        self.n_blocks = n_blocks
+        self.stride = stride
+
+    @classmethod
+    def build(cls, data, stride=DEFAULT_STRIDE):
+        ends = np.fromiter((m.end() for m in _END.finditer(data)), dtype=np.int64)
+        starts = np.r_[0, ends[:-1]][::stride]
+        offsets = np.r_[starts, ends[-1] if len(ends) else 0].astype(np.int64)
+        first_frames = np.empty(len(starts), dtype=np.int64)
+        for i, (a, b) in enumerate(zip(offsets[:-1], offsets[1:])):
+            m = _FRAME.search(data, a, b)
+            first_frames[i] = int(m.group(1)) - 1 if m else -1
+        return cls(offsets, first_frames, len(ends), stride)
+
+    @property
+    def ordered(self):
+        # La búsqueda por frame requiere FrameCnt creciente (lo normal en DJI)
+        valid = self.first_frames[self.first_frames >= 0]
+        return len(valid) == len(self.first_frames) and bool(np.all(np.diff(valid) > 0))
+
+    def chunk_for(self, frame):
+        i = int(np.searchsorted(self.first_frames, frame, side="right")) - 1
+        return i if i >= 0 else None
+
+    def save(self, path, srt_size, srt_mtime_ns):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.stride, srt_size, srt_mtime_ns,
+                                      self.n_blocks, len(self.first_frames)))
+            f.write(self.offsets.astype("<i8").tobytes())
+            f.write(self.first_frames.astype("<i8").tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, srt_size, srt_mtime_ns):
+        try:
+            with open(path, "rb") as f:
+                magic, version, stride, size, mtime_ns, n_blocks, n_chunks = \
+                    INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if (magic != INDEX_MAGIC or version != INDEX_VERSION
+                        or (size, mtime_ns) != (srt_size, srt_mtime_ns)):
+                    return None
+                arrays = np.fromfile(f, dtype="<i8")
+        except (OSError, struct.error, ValueError):
+            return None
+        if len(arrays) != 2 * n_chunks + 1:
+            return None
+        return cls(arrays[:n_chunks + 1], arrays[n_chunks + 1:], n_blocks, stride)
+
+
+class LazySrtTelemetry:
+    # Misma interfaz de consulta que SrtTelemetry (get / [] / in / len) sin parsear todo
+    def __init__(self, srt_path, stride=DEFAULT_STRIDE, cache_chunks=DEFAULT_CACHE_CHUNKS, use_cache=True):
+        self.path = srt_path
+        self.cache_chunks = cache_chunks
+        self._file = open(srt_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        st = os.stat(srt_path)
+        index_path = os.path.splitext(srt_path)[0] + INDEX_EXT
+        self.index = SrtIndex.load(index_path, st.st_size, st.st_mtime_ns) if use_cache else None
+        if self.index is None:
+            self.index = SrtIndex.build(self._data, stride)
+            if use_cache:
+                try:
+                    self.index.save(index_path, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    pass
+        self._chunks = OrderedDict()
+        self._full = None if self.index.ordered else self._decode(0, len(self.index.first_frames))
+
+    def _decode(self, first, last):
+        a, b = self.index.offsets[first], self.index.offsets[last]
+        return parse_srt_text(bytes(self._data[a:b]).decode("utf-8", errors="ignore"))
+
+    def chunk(self, i):
+        tel = self._chunks.get(i)
+        if tel is None:
+            tel = self._decode(i, i + 1)
+            self._chunks[i] = tel
+            if len(self._chunks) > self.cache_chunks:
+                self._chunks.popitem(last=False)
+        else:
+            self._chunks.move_to_end(i)
+        return tel
+
+    def _lookup(self, frame):
+        if self._full is not None:
+            return self._full
+        i = self.index.chunk_for(frame)
+        return None if i is None else self.chunk(i)
+
+    def tramo(self, frame):
+        # (clave, SrtTelemetry) del tramo que contiene a frame, o (None, None)
+        if self._full is not None:
+            return -1, self._full
+        i = self.index.chunk_for(frame)
+        return (None, None) if i is None else (i, self.chunk(i))
+
+    def get(self, frame, default=None):
+        tel = self._lookup(frame)
+        return default if tel is None else tel.get(frame, default)
+
+    def __getitem__(self, frame):
+        data = self.get(frame)
+        if data is None:
+            raise KeyError(frame)
+        return data
+
+    def __contains__(self, frame):
+        tel = self._lookup(frame)
+        return tel is not None and frame in tel
+
+    def __len__(self):
+        return self.index.n_blocks
+
+    def rango(self, first_frame, last_frame):
+        # SrtTelemetry con los frames first_frame..last_frame (inclusive)
+        if self._full is not None:
+            tel = self._full
+        else:
+            i = self.index.chunk_for(first_frame) or 0
+            j = self.index.chunk_for(last_frame)
+            j = len(self.index.first_frames) - 1 if j is None else j
+            if i > j:
+                return SrtTelemetry(np.empty(0, dtype=np.int64), {k: np.empty(0) for k in COLUMNS})
+            tel = self.chunk(i) if i == j else self._decode(i, j + 1)
+        keep = (tel.frames >= first_frame) & (tel.frames <= last_frame)
+        return SrtTelemetry(tel.frames[keep], {k: tel.columns[k][keep] for k in COLUMNS})
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def abrir_telemetria(srt_path, build_sidecar=True):
+    # Sidecar completo si ya existe (memmap, instantáneo); si no, índice perezoso y,
+    # en segundo plano, el parseo completo que deja el sidecar para la próxima vez
+    telemetry = cargar_sidecar(srt_path)
+    if telemetry is not None:
+        print(f"✅ Frames con datos cargados: {len(telemetry)} (caché)")
+        return telemetry
+    telemetry = LazySrtTelemetry(srt_path)
+    print(f"✅ SRT indexado: {len(telemetry)} bloques (telemetría bajo demanda)")
+    if build_sidecar:
+        threading.Thread(target=cargar_telemetria, args=(srt_path,), daemon=True).start()
+    return telemetry
@@ -0,0 +1,240 @@
+import os
+import re
+import zlib
+import struct
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# === Telemetría de los subtítulos .SRT de DJI ===
+# Cada bloque de subtítulo termina en </font>; los campos que aparecen desde el
+# bloque anterior se asignan al FrameCnt del bloque (si se repiten, gana el último).
+# En vez de varias búsquedas por línea, cada campo es un patrón precompilado que
+# recorre el texto entero una vez (en C); la posición de cada coincidencia decide
+# su bloque con un searchsorted sobre las posiciones de </font>. El resultado son
+# columnas NumPy (NaN = campo ausente) con un acceso por frame compatible con el
+# dict que devolvía parse_srt_by_frame.
+COLUMNS = ("lat", "lon", "alt", "gb_yaw", "gb_pitch", "gb_roll", "unix_ts")
+PARSER_VERSION = 1  # subir si cambia lo que produce parse_srt_text (invalida las cachés)
+UTC_OFFSET = timedelta(hours=5)  # los SRT vienen en hora local de la cámara (UTC-5)
+
+_END = re.compile(r"</font>")
+_FRAME = re.compile(r"FrameCnt: (\d+)")
+# "YYYY-MM-DD HH:MM:SS.ffff": un patrón que empieza por \d no tiene prefijo literal y
+# re lo prueba en cada posición (x15 más lento que los demás); se busca desde el
+# segundo guion ("-DD HH:...") y luego se comprueba el "YYYY-MM" que lo precede
+_TS = re.compile(r"-\d{2} \d{2}:\d{2}:\d{2}\.\d+")
+_TS_HEAD = re.compile(r"\d{4}-\d{2}")
+_FIELDS = {
+    "lat": re.compile(r"\[latitude: ([\-\d\.]+)\]"),
+    "lon": re.compile(r"\[longitude: ([\-\d\.]+)\]"),
+    "alt": re.compile(r"\[rel_alt: ([\-\d\.]+)"),
+    "gb_yaw": re.compile(r"\[gb_yaw:\s*([\-\d\.]+)"),
+    "gb_pitch": re.compile(r"gb_pitch:\s*([\-\d\.]+)"),
+    "gb_roll": re.compile(r"gb_roll:\s*([\-\d\.]+)"),
+}
+
+
+def _unix_ts(text):
+    # Igual que (datetime.strptime(text, "%Y-%m-%d %H:%M:%S.%f") - 5 h).timestamp()
+    frac = text[20:]
+    dt = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                  int(text[11:13]), int(text[14:16]), int(text[17:19]),
+                  int(frac.ljust(6, "0")[:6]))
+    return (dt - UTC_OFFSET).timestamp()
+
+
+def _unix_ts_array(texts):
+    # Vectorizado: datetime64 interpreta la hora como UTC; .timestamp() de un datetime
+    # sin zona usa la hora local, así que se suma el desfase local, que sólo se puede
+    # aplicar en bloque si no cambia (horario de verano) entre el primer y el último
+    if not texts:
+        return np.empty(0)
+    naive = np.array([t[:26] for t in texts], dtype="datetime64[us]") - np.timedelta64(UTC_OFFSET)
+    secs = naive.astype(np.int64) / 1e6
+    first, last = _unix_ts(texts[0]), _unix_ts(texts[-1])
+    if abs((first - secs[0]) - (last - secs[-1])) > 1e-3:
+        return np.array([_unix_ts(t) for t in texts])
+    return secs + (first - secs[0])
+
+
+def _scan(pattern, text):
+    # Posiciones y valores (texto) de todas las coincidencias
+    found = [(m.start(), m.group(1)) for m in pattern.finditer(text)]
+    if not found:
+        return np.empty(0, dtype=np.int64), []
+    pos, values = zip(*found)
+    return np.asarray(pos, dtype=np.int64), list(values)
+
+
+def _scan_ts(text):
+    found = [(m.start() - 7, text[m.start() - 7:m.end()]) for m in _TS.finditer(text)
+             if m.start() >= 7 and _TS_HEAD.fullmatch(text, m.start() - 7, m.start())]
+    if not found:
+        return np.empty(0, dtype=np.int64), []
+    pos, values = zip(*found)
+    return np.asarray(pos, dtype=np.int64), list(values)
+
+
+def _por_bloque(ends, pos, values, n_blocks):
+    # Columna de n_blocks con el último valor de cada bloque (NaN si no aparece)
+    col = np.full(n_blocks, np.nan)
+    if not len(pos):
+        return col
+    block = np.searchsorted(ends, pos)
+    inside = block < n_blocks  # lo que va tras el último </font> no cuenta
+    block, values = block[inside], np.asarray(values, dtype=float)[inside]
+    last = np.r_[block[1:] != block[:-1], True] if len(block) else block.astype(bool)
+    col[block[last]] = values[last]
+    return col
+
+
+class SrtTelemetry:
+    # Columnas por frame (0-based, FrameCnt - 1), ordenadas por frame y sin repetidos
+    def __init__(self, frames, columns):
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.columns = {k: np.asarray(columns[k], dtype=float) for k in COLUMNS}
+        self._row = {f: i for i, f in enumerate(self.frames.tolist())}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, frame):
+        return frame in self._row
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def row(self, frame):
+        return self._row.get(frame)
+
+    def get(self, frame, default=None):
+        # Mismo dict que el parser anterior: None donde falta el campo
+        i = self._row.get(frame)
+        if i is None:
+            return default
+        data = {k: self.columns[k][i] for k in COLUMNS}
+        data = {k: None if np.isnan(v) else float(v) for k, v in data.items()}
+        data["frame_unix_ts"] = data["unix_ts"]
+        return data
+
+    def __getitem__(self, frame):
+        data = self.get(frame)
+        if data is None:
+            raise KeyError(frame)
+        return data
+
+    def keys(self):
+        return self._row.keys()
+
+    def __iter__(self):
+        return iter(self._row)
+
+
+def parse_srt_text(text):
+    ends = np.array([m.start() for m in _END.finditer(text)], dtype=np.int64)
+    n = len(ends)
+    frame_pos, frame_txt = _scan(_FRAME, text)
+    frames = _por_bloque(ends, frame_pos, frame_txt, n)
+    cols = {k: _por_bloque(ends, *_scan(p, text), n) for k, p in _FIELDS.items()}
+    ts_pos, ts_txt = _scan_ts(text)
+    cols["unix_ts"] = _por_bloque(ends, ts_pos, _unix_ts_array(ts_txt), n)
+
+    has_frame = ~np.isnan(frames)
+    frames = frames[has_frame].astype(np.int64) - 1
+    cols = {k: v[has_frame] for k, v in cols.items()}
+    if len(frames):
+        # Frames repetidos: gana el último bloque, como en el dict anterior
+        _, last = np.unique(frames[::-1], return_index=True)
+        keep = len(frames) - 1 - last
+        frames = frames[keep]
+        cols = {k: v[keep] for k, v in cols.items()}
+    return SrtTelemetry(frames, cols)
+
+
+def parse_srt(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return parse_srt_text(f.read())
+
+
+# === Caché binaria junto al video (<video>.telemetry) ===
+# Cabecera de 64 bytes con la versión del parser y el tamaño/mtime del SRT del que
+# salió, seguida de un registro por frame. Se abre con np.memmap: reabrir un vuelo
+# largo no vuelve a leer el SRT. Si el SRT cambió, la versión no coincide o el
+# archivo está truncado o dañado (CRC), se reconstruye.
+SIDECAR_EXT = ".telemetry"
+SIDECAR_MAGIC = b"STEL"
+SIDECAR_HEADER = struct.Struct("<4sHHQQqI28x")  # magic, versión, tamaño registro, n, tamaño SRT, mtime_ns, crc32
+SIDECAR_DTYPE = np.dtype([("frame", "<i8")] + [(k, "<f8") for k in COLUMNS])
+
+
+def sidecar_path(srt_path):
+    return os.path.splitext(srt_path)[0] + SIDECAR_EXT
+
+
+def _srt_stamp(srt_path):
+    st = os.stat(srt_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def guardar_sidecar(telemetry, srt_path, path=None):
+    path = path or sidecar_path(srt_path)
+    records = np.empty(len(telemetry), dtype=SIDECAR_DTYPE)
+    records["frame"] = telemetry.frames
+    for k in COLUMNS:
+        records[k] = telemetry.columns[k]
+    size, mtime_ns = _srt_stamp(srt_path)
+    data = records.tobytes()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(SIDECAR_HEADER.pack(SIDECAR_MAGIC, PARSER_VERSION, SIDECAR_DTYPE.itemsize,
+                                    len(records), size, mtime_ns, zlib.crc32(data)))
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def cargar_sidecar(srt_path, path=None):
+    # SrtTelemetry sobre un memmap del sidecar, o None si falta o no es válido
+    path = path or sidecar_path(srt_path)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(SIDECAR_HEADER.size)
+        magic, version, record_size, n, size, mtime_ns, crc = SIDECAR_HEADER.unpack(raw)
+        if (magic != SIDECAR_MAGIC or version != PARSER_VERSION or record_size != SIDECAR_DTYPE.itemsize
+                or (size, mtime_ns) != _srt_stamp(srt_path)
+                or os.path.getsize(path) != SIDECAR_HEADER.size + n * record_size):
+            return None
+        if not n:
+            return SrtTelemetry(np.empty(0, dtype=np.int64), {k: np.empty(0) for k in COLUMNS})
+        records = np.memmap(path, dtype=SIDECAR_DTYPE, mode="r", offset=SIDECAR_HEADER.size, shape=(n,))
+        if zlib.crc32(records) != crc:
+            return None
+    except (OSError, struct.error, ValueError):
+        return None
+    return SrtTelemetry(records["frame"], {k: records[k] for k in COLUMNS})
+
+
+def cargar_telemetria(srt_path, use_cache=True):
+    # Devuelve (telemetría, True si vino de la caché)
+    if use_cache:
+        cached = cargar_sidecar(srt_path)
+        if cached is not None:
+            return cached, True
+    telemetry = parse_srt(srt_path)
+    if use_cache:
+        try:
+            guardar_sidecar(telemetry, srt_path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché de telemetría: {e}")
+    return telemetry, False
+
+
+def parse_srt_by_frame(path):
+    telemetry, cached = cargar_telemetria(path)
+    origen = " (caché)" if cached else ""
+    print(f"✅ Frames con datos cargados: {len(telemetry)}{origen}")
+    return telemetry
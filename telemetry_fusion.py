@@ -0,0 +1,227 @@
+import os
+import sys
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from gimbal import rotar_normales_a_camara
+from calibration import cargar_perfil
+from capture_format import cargar_captura
+from distance_filters import CHANNELS, filtrar_dataframe
+from sensor_functions import calcular_inclinacion_pared_lote
+from srt_index import DEFAULT_CACHE_CHUNKS
+from srt_telemetry import COLUMNS, SrtTelemetry, parse_srt_by_frame
+from temporal_join import DEFAULT_K, TemporalJoin
+
+# === Tabla fusionada por frame ===
+# Video a 30 fps, sensores a 2–10 Hz: en vez de buscar muestras, calcular la normal
+# y rotarla a cámara cada vez que se muestra o guarda un frame, todo se calcula una
+# vez, en lote, para cada frame del video (o por tramos del SRT a medida que se
+# piden, si la telemetría viene del índice perezoso):
+#   telemetría SRT → distancias en el timestamp del frame (lineal o media de las k
+#   más cercanas) → antigüedad de la muestra real más cercana → normal en el dron →
+#   normal en la cámara según el gimbal.
+# Reproducir y guardar waypoints pasa a ser leer una fila.
+MODES = ("linear", "knn")
+FUSED_COLUMNS = (("frame",) + COLUMNS + CHANNELS
+                 + ("staleness_ms", "pitch", "yaw", "normal_x", "normal_y", "normal_z",
+                    "cam_pitch", "cam_yaw", "cam_normal_x", "cam_normal_y", "cam_normal_z"))
+
+
+def cargar_distancias(path, filtrar=True):
+    # Captura lista para la unión temporal: sin dropouts (-1) ni picos, y sin filas
+    # en las que no queda ningún canal
+    df = cargar_captura(path)
+    if filtrar:
+        df = filtrar_dataframe(df)
+    return df.dropna(subset=list(CHANNELS), how="all").reset_index(drop=True)
+
+
+class FusedTelemetry:
+    # Columnas NumPy indexadas directamente por frame (0-based, como las claves del SRT)
+    def __init__(self, columns, has_srt):
+        self.columns = columns
+        self.has_srt = has_srt
+
+    def __len__(self):
+        return len(self.has_srt)
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def row(self, frame):
+        # dict con todas las columnas del frame (NaN donde falta), o None sin telemetría
+        if not 0 <= frame < len(self.has_srt) or not self.has_srt[frame]:
+            return None
+        data = {k: float(v[frame]) for k, v in self.columns.items()}
+        data["frame"] = int(frame)
+        return data
+
+    def get(self, frame, default=None):
+        data = self.row(frame)
+        return default if data is None else data
+
+    def to_dataframe(self):
+        df = pd.DataFrame({k: self.columns[k] for k in FUSED_COLUMNS})
+        return df[self.has_srt].reset_index(drop=True)
+
+    def exportar_csv(self, path):
+        self.to_dataframe().to_csv(path, index=False)
+        return path
+
+
+class LazyFusedTelemetry:
+    # Misma consulta (row / get / len / exportar_csv) sobre un LazySrtTelemetry: las
+    # filas se fusionan por tramos del índice del SRT según se piden, sin decodificar
+    # el vuelo entero al abrir; los últimos tramos fusionados quedan en un LRU
+    def __init__(self, telemetry, join, n_frames=None, cache_chunks=DEFAULT_CACHE_CHUNKS, **params):
+        self.telemetry = telemetry
+        self.join = join
+        self.n_frames = n_frames or 0
+        self.cache_chunks = cache_chunks
+        self.params = params
+        self._chunks = OrderedDict()  # tramo → (columnas, {frame: fila})
+
+    def __len__(self):
+        return max(self.n_frames, len(self.telemetry))
+
+    def _tramo(self, frame):
+        key, tel = self.telemetry.tramo(frame)
+        if tel is None:
+            return None
+        fused = self._chunks.get(key)
+        if fused is None:
+            columns = _fusionar_columnas(tel, self.join, **self.params)
+            fused = columns, {f: i for i, f in enumerate(tel.frames.tolist())}
+            self._chunks[key] = fused
+            if len(self._chunks) > self.cache_chunks:
+                self._chunks.popitem(last=False)
+        else:
+            self._chunks.move_to_end(key)
+        return fused
+
+    def row(self, frame):
+        fused = self._tramo(frame)
+        if fused is None:
+            return None
+        columns, rows = fused
+        i = rows.get(frame)
+        if i is None:
+            return None
+        data = {k: float(v[i]) for k, v in columns.items()}
+        data["frame"] = int(frame)
+        return data
+
+    def get(self, frame, default=None):
+        data = self.row(frame)
+        return default if data is None else data
+
+    def to_dataframe(self):
+        # Exportar sí necesita el SRT entero (sólo al pedirlo)
+        tel = self.telemetry.rango(0, sys.maxsize)
+        return pd.DataFrame(_fusionar_columnas(tel, self.join, **self.params))[list(FUSED_COLUMNS)]
+
+    def exportar_csv(self, path):
+        self.to_dataframe().to_csv(path, index=False)
+        return path
+
+
+def _fusionar_columnas(tel, join, mode="linear", k=DEFAULT_K, perfil=None, max_staleness_ms=None):
+    # Columnas fusionadas de un SrtTelemetry: una fila por frame de tel, en su orden
+    n = len(tel)
+    columns = {name: np.full(n, np.nan) for name in FUSED_COLUMNS}
+    columns["frame"] = np.asarray(tel.frames)
+    for name in COLUMNS:
+        columns[name] = np.array(tel.columns[name], dtype=float)
+
+    ts = columns["unix_ts"]
+    timed = ~np.isnan(ts)
+    if join is not None and len(join) and timed.any():
+        if mode == "linear":
+            values = join.interpolar_bulk(ts[timed])
+        else:
+            values = join.promedio_bulk(ts[timed], min(k, len(join)))[0]
+        stale = join.separacion_bulk(ts[timed]) * 1000.0
+        if max_staleness_ms is not None:
+            values[stale > max_staleness_ms] = np.nan
+        columns["staleness_ms"][timed] = stale
+        for c, name in enumerate(join.columns):
+            if name in CHANNELS:
+                columns[name][timed] = values[:, c]
+
+    perfil = perfil or cargar_perfil()
+    pitch, yaw, normal = calcular_inclinacion_pared_lote(columns["bottom"], columns["side"], columns["top"], perfil)
+    normal_cam, cam_pitch, cam_yaw = rotar_normales_a_camara(normal, columns["gb_yaw"],
+                                                             columns["gb_pitch"], columns["gb_roll"])
+    columns["pitch"], columns["yaw"] = pitch, yaw
+    columns["cam_pitch"], columns["cam_yaw"] = cam_pitch, cam_yaw
+    for i, axis in enumerate("xyz"):
+        columns[f"normal_{axis}"] = normal[:, i]
+        columns[f"cam_normal_{axis}"] = normal_cam[:, i]
+    return columns
+
+
+def fusionar(telemetry, join=None, n_frames=None, mode="linear", k=DEFAULT_K, perfil=None,
+             max_staleness_ms=None):
+    # SrtTelemetry → FusedTelemetry (todo en lote); LazySrtTelemetry → LazyFusedTelemetry
+    # (por tramos, bajo demanda); {} sin SRT → tabla vacía de n_frames
+    if mode not in MODES:
+        raise ValueError(f"modo de interpolación desconocido: {mode!r} (usa {', '.join(MODES)})")
+    params = dict(mode=mode, k=k, perfil=perfil or cargar_perfil(), max_staleness_ms=max_staleness_ms)
+    if hasattr(telemetry, "tramo"):
+        return LazyFusedTelemetry(telemetry, join, n_frames=n_frames, **params)
+
+    tel = telemetry if hasattr(telemetry, "frames") else None
+    n = n_frames or 0
+    if tel is not None:
+        keep = tel.frames >= 0
+        tel = SrtTelemetry(tel.frames[keep], {name: tel.columns[name][keep] for name in COLUMNS})
+        if len(tel):
+            n = max(n, int(tel.frames.max()) + 1)
+
+    columns = {name: np.full(n, np.nan) for name in FUSED_COLUMNS}
+    columns["frame"] = np.arange(n)
+    has_srt = np.zeros(n, dtype=bool)
+    if tel is not None and len(tel):
+        fused = _fusionar_columnas(tel, join, **params)
+        has_srt[tel.frames] = True
+        for name in FUSED_COLUMNS:
+            if name != "frame":
+                columns[name][tel.frames] = fused[name]
+    return FusedTelemetry(columns, has_srt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tabla por frame: telemetría SRT + distancias + normales")
+    parser.add_argument("srt", help="subtítulos .SRT del video")
+    parser.add_argument("capture", help="captura de distancias (.csv o .scap)")
+    parser.add_argument("-o", "--output", help="CSV de salida (por defecto <video>_fused.csv)")
+    parser.add_argument("--mode", choices=MODES, default="linear", help="interpolación de distancias")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="muestras promediadas en modo knn")
+    parser.add_argument("--max-staleness", type=float, default=None,
+                        help="ms máximos hasta la muestra real más cercana (más lejos → NaN)")
+    parser.add_argument("--frames", type=int, default=None, help="frames del video (por defecto los del SRT)")
+    parser.add_argument("--calibration", help="perfil de calibración JSON")
+    parser.add_argument("--no-filter", action="store_true", help="no filtrar dropouts ni picos")
+    args = parser.parse_args(argv)
+
+    try:
+        join = TemporalJoin.from_dataframe(cargar_distancias(args.capture, filtrar=not args.no_filter))
+        fused = fusionar(parse_srt_by_frame(args.srt), join, n_frames=args.frames, mode=args.mode, k=args.k,
+                         perfil=cargar_perfil(args.calibration), max_staleness_ms=args.max_staleness)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    output = args.output or os.path.splitext(args.srt)[0] + "_fused.csv"
+    fused.exportar_csv(output)
+    print(f"✅ {int(fused.has_srt.sum())} frames exportados a {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
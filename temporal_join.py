@@ -0,0 +1,113 @@
+import numpy as np
+
+# === Unión temporal video ↔ sensores ===
+# Las muestras de distancia están ordenadas por timestamp: para un instante t, la
+# búsqueda binaria da el punto de inserción y las k más cercanas se toman
+# expandiendo dos punteros hacia fuera (a igual distancia gana la muestra
+# anterior, como nsmallest sobre el DataFrame ordenado). Consulta por frame en
+# O(log N + k) sin copiar el DataFrame, y modo en lote que alinea todos los
+# timestamps de un video en una sola llamada.
+DEFAULT_K = 3
+
+
+class TemporalJoin:
+    def __init__(self, timestamps, values, columns):
+        order = np.argsort(timestamps, kind="stable")
+        self.timestamps = np.asarray(timestamps, dtype=float)[order]
+        self.values = np.asarray(values, dtype=float)[order]
+        self.columns = tuple(columns)
+        # Copias en listas para la consulta escalar: indexar listas no crea objetos NumPy
+        self._ts = self.timestamps.tolist()
+        self._rows = self.values.tolist()
+
+    @classmethod
+    def from_dataframe(cls, df, columns=("side", "top", "bottom"), time_column="timestamp"):
+        return cls(df[time_column].to_numpy(dtype=float), df[list(columns)].to_numpy(dtype=float), columns)
+
+    def __len__(self):
+        return len(self._ts)
+
+    def nearest(self, t, k=DEFAULT_K):
+        # Índices de las k muestras más cercanas a t, en orden de cercanía
+        n = len(self._ts)
+        if n < k:
+            return None
+        right = int(np.searchsorted(self.timestamps, t))
+        left = right - 1
+        out = []
+        ts = self._ts
+        while len(out) < k:
+            if right >= n or (left >= 0 and t - ts[left] <= ts[right] - t):
+                out.append(left)
+                left -= 1
+            else:
+                out.append(right)
+                right += 1
+        return out
+
+    def promedio(self, t, k=DEFAULT_K):
+        # {columna: media de las k más cercanas} ignorando NaN; None si hay < k muestras
+        idx = self.nearest(t, k)
+        if idx is None:
+            return None
+        result = {}
+        for c, name in enumerate(self.columns):
+            total, count = 0.0, 0
+            for i in idx:
+                v = self._rows[i][c]
+                if v == v:  # no NaN
+                    total += v
+                    count += 1
+            result[name] = total / count if count else float("nan")
+        return result
+
+    def nearest_bulk(self, times, k=DEFAULT_K):
+        # (M, k) índices de las k más cercanas para cada t; las candidatas están en
+        # [i - k, i + k) alrededor del punto de inserción i. argsort estable sobre la
+        # ventana (en orden temporal) desempata a favor de la muestra anterior
+        times = np.asarray(times, dtype=float)
+        n = len(self.timestamps)
+        if n < k:
+            raise ValueError(f"se necesitan al menos {k} muestras, hay {n}")
+        ins = np.searchsorted(self.timestamps, times)
+        window = ins[:, None] + np.arange(-k, k)
+        inside = (window >= 0) & (window < n)
+        clipped = np.clip(window, 0, n - 1)
+        dist = np.where(inside, np.abs(self.timestamps[clipped] - times[:, None]), np.inf)
+        # NaN en times: distancia NaN en toda la fila, el orden no importa
+        pick = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(clipped, pick, axis=1)
+
+    def promedio_bulk(self, times, k=DEFAULT_K):
+        # (M, columnas) medias de las k más cercanas y (M,) separación máxima en s
+        idx = self.nearest_bulk(times, k)
+        vals = self.values[idx]  # (M, k, C)
+        valid = ~np.isnan(vals)
+        count = valid.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(valid, vals, 0.0).sum(axis=1) / count
+        gap = np.abs(self.timestamps[idx] - np.asarray(times, dtype=float)[:, None]).max(axis=1)
+        return means, gap
+
+    def interpolar_bulk(self, times):
+        # (M, columnas) interpolación lineal entre las muestras válidas de cada canal;
+        # fuera del intervalo medido queda NaN (no se extrapola)
+        times = np.asarray(times, dtype=float)
+        out = np.full((len(times), len(self.columns)), np.nan)
+        for c in range(len(self.columns)):
+            valid = ~np.isnan(self.values[:, c])
+            if valid.sum() >= 2:
+                out[:, c] = np.interp(times, self.timestamps[valid], self.values[valid, c],
+                                      left=np.nan, right=np.nan)
+        return out
+
+    def separacion_bulk(self, times):
+        # (M,) distancia en s de cada t a la muestra más cercana (NaN si no hay muestras)
+        times = np.asarray(times, dtype=float)
+        n = len(self.timestamps)
+        if not n:
+            return np.full(len(times), np.nan)
+        ins = np.searchsorted(self.timestamps, times)
+        left = self.timestamps[np.clip(ins - 1, 0, n - 1)]
+        right = self.timestamps[np.clip(ins, 0, n - 1)]
+        return np.minimum(np.abs(times - left), np.abs(right - times))
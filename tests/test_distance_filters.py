@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from distance_filters import CHANNELS, ChannelFilter, filtrar_canal
+
+FIRST_TEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "first_test.csv")
+# Meseta de first_test.csv (sensor quieto frente a la pared, ±2–3 mm de jitter)
+MESETA = slice(101, 143)
+
+
+@pytest.fixture(scope="module")
+def captura():
+    return pd.read_csv(FIRST_TEST)
+
+
+@pytest.mark.parametrize("canal", CHANNELS)
+def test_meseta_sin_rechazos_en_lote(captura, canal):
+    out = filtrar_canal(captura[canal].to_numpy(dtype=float))
+    assert not np.isnan(out[MESETA]).any()
+
+
+@pytest.mark.parametrize("canal", CHANNELS)
+def test_meseta_sin_rechazos_en_linea(captura, canal):
+    f = ChannelFilter()
+    out = np.array([f.update(0.0, v) for v in captura[canal]])
+    assert not np.isnan(out[MESETA]).any()
+
+
+def test_lectura_aislada_sigue_rechazada():
+    values = np.full(21, 638.0)
+    values[10] = 700.0
+    assert np.isnan(filtrar_canal(values)[10])
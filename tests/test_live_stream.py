@@ -0,0 +1,33 @@
+import calendar
+import datetime
+import os
+import time
+
+import pytest
+
+from ble_manager import sync_command
+from live_stream import LiveInclinometer
+
+
+@pytest.fixture
+def tz_utc_menos_5():
+    old = os.environ.get("TZ")
+    os.environ["TZ"] = "EST+05"
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = old
+    time.tzset()
+
+
+def test_retardo_con_hora_local_no_utc(tz_utc_menos_5):
+    # El firmware toma la hora de SYNC (local) con mktime sin TZ, es decir, como UTC
+    ts = sync_command().split(":", 1)[1]
+    now = datetime.datetime.strptime(ts, "%Y-%m-%d %H:%M:%S.%f")
+    ts_ms = calendar.timegm(now.timetuple()) * 1000 + now.microsecond // 1000
+
+    live = LiveInclinometer()
+    live.push_records([(ts_ms, 500, 500, 500)])
+    assert 0 <= live.latest()["delay_ms"] < 1000
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+import pytest
+
+from rectification import RectificationEngine, homografia_rectificacion
+
+W, H = 640, 360
+NORMALES = ([0.1, 0.05, 1.0], [0.3, -0.2, 1.0], [-0.4, 0.3, 1.0], [0.0, 0.0, 1.0])
+
+
+@pytest.fixture(scope="module")
+def imagen():
+    # Textura suave (ruido desenfocado) que ocupa todo el rango de grises
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (H, W, 3), dtype=np.uint8), (0, 0), 3)
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+
+
+@pytest.mark.parametrize("normal", NORMALES)
+def test_remap_exacto_coincide_con_warp_perspective(imagen, normal):
+    n = np.asarray(normal) / np.linalg.norm(normal)
+    Hm = homografia_rectificacion(n, W, H)
+    ref = cv2.warpPerspective(imagen, Hm, (W, H), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+    out = RectificationEngine(step_deg=0).rectificar(imagen, normal)
+    diff = np.abs(out.astype(int) - ref).max(axis=2)
+
+    # Interior: ±1 nivel; en la franja junto al borde negro, la diferencia medida llega a 3–4
+    mask = cv2.warpPerspective(np.full((H, W), 255, np.uint8), Hm, (W, H))
+    interior = cv2.erode(mask, np.ones((5, 5), np.uint8)) > 0
+    assert diff[interior].max() <= 1
+    assert diff.max() <= 4
+    assert diff.mean() < 0.5
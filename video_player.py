@@ -0,0 +1,118 @@
+import time
+import queue
+import threading
+
+# === Reproducción continua con decodificación en segundo plano ===
+# En modo play el bucle de las herramientas hacía en serie cap.read(), telemetría,
+# putText e imshow y luego esperaba otro frame entero en waitKey(1000 / fps): el
+# video iba más lento que el real y a tirones en 4K. Aquí un hilo decodifica y llena
+# una cola acotada mientras el bucle de pantalla sólo dibuja; el ritmo lo marca un
+# reloj de pared (el frame i se muestra en t0 + (i - i0) / fps) y los frames que ya
+# llegan tarde se descartan en vez de acumular retraso.
+DEFAULT_QUEUE = 16
+
+
+class VideoPlayer:
+    def __init__(self, video, queue_size=DEFAULT_QUEUE, fps=None):
+        # video: FrameAccess (o cualquier objeto con read(i) → frame | None)
+        self.video = video
+        self.fps = fps or video.fps
+        self.queue_size = queue_size
+        self.shown = 0
+        self.dropped = 0
+        self._queue = None
+        self._stop = None
+        self._thread = None
+        self._t0 = 0.0
+        self._i0 = 0
+        self._last = None
+        self._error = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _due(self, frame_index):
+        return self._t0 + (frame_index - self._i0) / self.fps
+
+    def _put(self, frames, stop, item):
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                continue
+
+    def _decode_loop(self, first, frames, stop):
+        # El None final se encola siempre, también si read() falla: next() nunca se
+        # queda esperando a un hilo muerto y vuelve a lanzar el error
+        i = first
+        try:
+            while not stop.is_set():
+                frame = self.video.read(i)
+                if frame is None:
+                    return
+                self._put(frames, stop, (i, frame))
+                i += 1
+        except Exception as e:
+            if not stop.is_set():
+                self._error = e
+        finally:
+            self._put(frames, stop, None)
+
+    def start(self, frame_index):
+        self.stop()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stop = threading.Event()
+        self._t0 = time.perf_counter()
+        self._i0 = frame_index
+        self._last = None
+        self._error = None
+        self._thread = threading.Thread(target=self._decode_loop, args=(frame_index, self._queue, self._stop),
+                                        daemon=True)
+        self._thread.start()
+
+    def next(self):
+        # (frame_index, frame) del siguiente frame a mostrar, o None al final del video;
+        # si la decodificación falló, su excepción se lanza aquí.
+        # Si ya toca el siguiente y hay más en cola, éste se salta
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._thread.is_alive():
+                    continue
+                item = None
+            if item is None:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                return None
+            i, frame = item
+            if time.perf_counter() >= self._due(i + 1) and not self._queue.empty():
+                self.dropped += 1
+                continue
+            delay = self._due(i) - time.perf_counter()
+            if delay > 0.002:
+                time.sleep(delay)
+            self.shown += 1
+            self._last = i
+            return i, frame
+
+    def wait_ms(self):
+        # Espera para cv2.waitKey hasta que toque el siguiente frame (mínimo 1 ms)
+        if self._last is None:
+            return 1
+        return max(1, int((self._due(self._last + 1) - time.perf_counter()) * 1000))
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join(timeout=1)
+        self._thread = None
@@ -3,6 +3,8 @@ import numpy as np
 import os
 from tkinter import Tk, filedialog
 
+from frame_access import FrameAccess
+
 # === Paso 1: Selección de video ===
 Tk().withdraw()
 video_path = filedialog.askopenfilename(title="Selecciona un video MP4", filetypes=[("Archivos MP4", "*.mp4")])
@@ -10,19 +12,18 @@ if not video_path:
     print("No se seleccionó ningún video.")
     exit()
 
-cap = cv2.VideoCapture(video_path)
-fps = cap.get(cv2.CAP_PROP_FPS)
-total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+video = FrameAccess(video_path)
+fps = video.fps
+total_frames = video.total_frames
 frame_index = 0
 paused = True
 
 print("🔁 Usa [A] y [D] para navegar. [W] para aplicar corrección. [Q] para salir.")
 
-while cap.isOpened():
+while True:
     if paused:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-        ret, frame = cap.read()
-        if not ret:
+        frame = video.read(frame_index)
+        if frame is None:
             print("⚠️ Fin del video.")
             break
 
@@ -36,7 +37,7 @@ while cap.isOpened():
     elif key == ord('a'):
         frame_index = max(frame_index - 1, 0)
     elif key == ord('d'):
-        frame_index = min(frame_index + 1, total_frames - 1)
+        frame_index = min(frame_index + 1, len(video) - 1)
     elif key == ord(' '):
         paused = not paused
     elif key == ord('w'):
@@ -91,5 +92,5 @@ while cap.isOpened():
         cv2.imwrite(out_path, corrected)
         print(f"📸 Imagen corregida exportada: {out_path}")
 
-cap.release()
+video.close()
 cv2.destroyAllWindows()